@@ -0,0 +1,108 @@
+import argparse
+import os
+import tempfile
+import time
+import cv2
+import numpy as np
+from camera import CameraDetector, VideoFileCamera
+from pipeline import DetectionPipeline
+from utils import load_config
+
+class EmulatedDetector(CameraDetector):
+    """CameraDetector with a fixed-cost stand-in for the DNN forward pass, for machines without the model files"""
+
+    def __init__(self, camera, infer_ms, config):
+        self.camera = camera
+        self.infer_ms = infer_ms
+        self.camera_config = config['camera']
+        self.detection_config = config['detection']
+        self.gate = self.create_gate()
+        self.last_result = (None, 0)
+        self.forward_passes = 0
+        self.emergency_classes = {}
+
+    def run_model(self, frame):
+        cv2.dnn.blobFromImage(frame, size=(300, 300), swapRB=True, crop=False)
+        # Burn CPU rather than sleep, so the gate's savings show up in cpu_seconds
+        deadline = time.thread_time() + self.infer_ms / 1000
+        while time.thread_time() < deadline:
+            pass
+        return np.zeros((1, 1, 0, 7), dtype=np.float32)
+
+    def __del__(self):
+        pass
+
+def synthetic_clip(path, size=(640, 480), frames=90, fps=30, static=False):
+    """Short clip of moving noise (or a still scene with sensor noise), so the benchmark runs without a recorded video"""
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), fps, size)
+    rng = np.random.default_rng(0)
+    coarse = rng.integers(0, 255, (size[1] // 16, size[0] // 8, 3), dtype=np.uint8)
+    base = cv2.resize(coarse, (size[0] * 2, size[1]), interpolation=cv2.INTER_CUBIC)
+    for i in range(frames):
+        if static:
+            noise = rng.integers(-4, 5, (size[1], size[0], 3))
+            frame = np.clip(base[:, :size[0]].astype(int) + noise, 0, 255).astype(np.uint8)
+        else:
+            frame = base[:, i * 4:i * 4 + size[0]]
+        writer.write(np.ascontiguousarray(frame))
+    writer.release()
+    return path
+
+def run_serial(detector, seconds, interval=0.0):
+    """The old main loop: capture, then infer, then sleep out the detection interval"""
+    inferred, latency = 0, 0.0
+    cpu, start = time.process_time(), time.monotonic()
+    while time.monotonic() - start < seconds:
+        captured_at = time.monotonic()
+        detector.infer(detector.capture())
+        latency += time.monotonic() - captured_at
+        inferred += 1
+        time.sleep(interval)
+    elapsed = time.monotonic() - start
+    stats = {"frame_fps": inferred / elapsed, "detection_fps": detector.forward_passes / elapsed,
+             "mean_latency": latency / inferred, "cpu_seconds": time.process_time() - cpu}
+    if getattr(detector, "gate", None) is not None:
+        stats["gate"] = detector.gate.stats()
+    return stats
+
+def run_pipelined(detector, seconds, interval=0.0, queue_size=1):
+    pipeline = DetectionPipeline(detector, queue_size, interval=interval)
+    cpu = time.process_time()
+    pipeline.start()
+    time.sleep(seconds)
+    pipeline.stop()
+    stats = pipeline.stats()
+    stats["cpu_seconds"] = time.process_time() - cpu
+    return stats
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serial vs pipelined detection throughput")
+    parser.add_argument("--video", help="video file to replay (default: a synthetic clip)")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--infer-ms", type=float,
+                        help="emulate a forward pass of this many ms instead of loading the model")
+    parser.add_argument("--static", action="store_true", help="synthetic clip of a still scene instead of motion")
+    parser.add_argument("--no-gating", action="store_true", help="run inference on every frame")
+    parser.add_argument("--interval", type=float,
+                        help="seconds between inference runs for both loops (default: detection.detection_interval, "
+                             "0 runs flat out)")
+    args = parser.parse_args()
+    config = load_config()
+    interval = config['detection'].get('detection_interval', 0.5) if args.interval is None else args.interval
+    config['detection'].setdefault('gating', {})['enabled'] = not args.no_gating
+    video = args.video or synthetic_clip(os.path.join(tempfile.mkdtemp(), "clip.avi"), static=args.static)
+
+    def make_detector():
+        if args.infer_ms is not None:
+            camera = VideoFileCamera(video, config['camera']['resolution'], config['camera'].get('fps'))
+            return EmulatedDetector(camera, args.infer_ms, config)
+        return CameraDetector(source=video)
+
+    for name, run in (("serial", run_serial), ("pipelined", run_pipelined)):
+        stats = run(make_detector(), args.seconds, interval)
+        print(f"{name:10s} {stats['frame_fps']:6.1f} frames/s  {stats['detection_fps']:6.1f} passes/s  latency {stats['mean_latency'] * 1000:6.1f} ms  "
+              f"cpu {stats['cpu_seconds']:5.1f} s" + (f"  dropped {stats['dropped']}" if "dropped" in stats else ""))
+        if "gate" in stats:
+            gate = stats["gate"]
+            print(f"{'':10s} gate skipped {gate['skipped']}/{gate['checked']} ({gate['skip_rate']:.0%})  "
+                  f"cpu saved {gate['cpu_saved']:5.1f} s")
@@ -1,24 +1,113 @@
+import time
 import cv2
 import numpy as np
-from picamera2 import Picamera2
 from utils import logger, load_config, log_detection
 
+class VideoFileCamera:
+    """Stand-in for Picamera2 that replays a video file, paced to the configured fps"""
+
+    def __init__(self, path, size=None, fps=None, loop=True):
+        self.capture = cv2.VideoCapture(path)
+        if not self.capture.isOpened():
+            raise IOError(f"Cannot open video source: {path}")
+        self.size = tuple(size) if size else None
+        self.interval = 1.0 / fps if fps else 0
+        self.loop = loop
+        self.next_frame = time.monotonic()
+
+    def start(self):
+        pass
+
+    def stop(self):
+        self.capture.release()
+
+    def capture_array(self):
+        """Next frame, in the same BGR memory order Picamera2 gives for RGB888"""
+        if self.interval:
+            delay = self.next_frame - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            self.next_frame = max(self.next_frame + self.interval, time.monotonic())
+        ok, frame = self.capture.read()
+        if not ok and self.loop:
+            self.capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ok, frame = self.capture.read()
+        if not ok:
+            raise EOFError("Video source exhausted")
+        if self.size and (frame.shape[1], frame.shape[0]) != self.size:
+            frame = cv2.resize(frame, self.size)
+        return frame
+
+class SceneGate:
+    """
+    Cheap check in front of the DNN: a frame is worth a forward pass only when its downsampled grey image
+    differs from the last inferred one by more than `threshold` grey levels on average, or when the last
+    pass is older than `max_staleness` seconds.
+    """
+
+    def __init__(self, threshold=6.0, max_staleness=5.0, size=(64, 48)):
+        self.threshold = threshold
+        self.max_staleness = max_staleness
+        self.size = tuple(size)
+        self.reference = None
+        self.last_run = 0.0
+        self.checked = 0
+        self.skipped = 0
+        self.gate_cpu = 0.0
+        self.inference_cpu = 0.0
+        self.inferences = 0
+
+    def changed(self, frame):
+        start = time.thread_time()
+        small = cv2.resize(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), self.size, interpolation=cv2.INTER_AREA)
+        small = small.astype(np.int16)
+        now = time.monotonic()
+        run = (self.reference is None or now - self.last_run >= self.max_staleness
+               or np.abs(small - self.reference).mean() > self.threshold)
+        if run:
+            self.reference = small
+            self.last_run = now
+        else:
+            self.skipped += 1
+        self.checked += 1
+        self.gate_cpu += time.thread_time() - start
+        return run
+
+    def record_inference(self, cpu_seconds):
+        self.inference_cpu += cpu_seconds
+        self.inferences += 1
+
+    def stats(self):
+        """Skip rate and CPU seconds saved (skipped passes at the measured cost, minus the gate's own cost)"""
+        per_pass = self.inference_cpu / self.inferences if self.inferences else 0.0
+        return {
+            "checked": self.checked,
+            "skipped": self.skipped,
+            "skip_rate": self.skipped / self.checked if self.checked else 0.0,
+            "cpu_saved": self.skipped * per_pass - self.gate_cpu,
+        }
+
 class CameraDetector:
-    def __init__(self):
+    def __init__(self, source=None):
         self.config = load_config()
         self.camera_config = self.config['camera']
         self.detection_config = self.config['detection']
+        source = source or self.camera_config.get('source')
         
-        # Initialize the camera
-        self.camera = Picamera2()
-        self.camera.configure(
-            self.camera.create_preview_configuration(
-                main={
-                    "format": 'RGB888',
-                    "size": self.camera_config['resolution']
-                }
+        # Initialize the camera, or replay a video file when one is configured (tests, benchmarks)
+        if source:
+            self.camera = VideoFileCamera(source, self.camera_config['resolution'], self.camera_config.get('fps'))
+        else:
+            from picamera2 import Picamera2
+            self.camera = Picamera2()
+            self.camera.configure(
+                self.camera.create_preview_configuration(
+                    main={
+                        "format": 'RGB888',
+                        "size": self.camera_config['resolution']
+                    }
+                )
             )
-        )
         self.camera.start()
         
         # Load pre-trained model for object detection
@@ -27,6 +116,10 @@ class CameraDetector:
             'models/ssd_mobilenet_v2_coco_2018_03_29.pbtxt'
         )
         
+        self.gate = self.create_gate()
+        self.last_result = (None, 0)
+        self.forward_passes = 0  # frames the model actually ran on, gated frames excluded
+        
         # Define medical emergency classes
         self.emergency_classes = {
             1: "CPR",
@@ -36,47 +129,69 @@ class CameraDetector:
             5: "Burn"
         }
         
+    def create_gate(self):
+        """Scene-change gate from the 'gating' section of the detection config, None when disabled"""
+        gating = self.detection_config.get('gating', {})
+        if not gating.get('enabled', False):
+            return None
+        return SceneGate(gating.get('threshold', 6.0), gating.get('max_staleness', 5.0),
+                         gating.get('size', (64, 48)))
+    
+    def capture(self):
+        """Grab the next frame from the camera"""
+        return self.camera.capture_array()
+    
+    def run_model(self, frame):
+        """SSD forward pass, returns the raw (1, 1, N, 7) detections"""
+        # Preprocess frame for detection
+        blob = cv2.dnn.blobFromImage(
+            frame, 
+            size=(300, 300),
+            swapRB=True,
+            crop=False
+        )
+        
+        # Run detection
+        self.model.setInput(blob)
+        return self.model.forward()
+    
+    def infer(self, frame):
+        """
+        Run the detector on one frame. When the scene gate finds nothing new in it, the previous
+        result stands for this frame too.
+        Returns tuple of (situation, confidence)
+        """
+        if self.gate is not None and not self.gate.changed(frame):
+            return self.last_result
+        start = time.thread_time()
+        detections = self.run_model(frame)
+        self.forward_passes += 1
+        if self.gate is not None:
+            self.gate.record_inference(time.thread_time() - start)
+        self.last_result = self.best_detection(detections)
+        if self.last_result[0]:
+            log_detection(*self.last_result)
+        return self.last_result
+    
+    def best_detection(self, detections):
+        """Highest-confidence emergency class above the threshold in one (1, 1, N, 7) output, or (None, 0)"""
+        rows = detections[0, 0]
+        class_ids = rows[:, 1].astype(int)
+        confidences = rows[:, 2]
+        mask = confidences > self.detection_config['confidence_threshold']
+        mask &= np.isin(class_ids, list(self.emergency_classes))
+        if not mask.any():
+            return None, 0
+        best = int(np.argmax(np.where(mask, confidences, -1)))
+        return self.emergency_classes[class_ids[best]], float(confidences[best])
+    
     def detect_situation(self):
         """
         Detect medical situations using computer vision.
         Returns tuple of (situation, confidence)
         """
         try:
-            # Capture frame
-            frame = self.camera.capture_array()
-            
-            # Preprocess frame for detection
-            blob = cv2.dnn.blobFromImage(
-                frame, 
-                size=(300, 300),
-                swapRB=True,
-                crop=False
-            )
-            
-            # Run detection
-            self.model.setInput(blob)
-            detections = self.model.forward()
-            
-            # Process detections
-            highest_confidence = 0
-            detected_situation = None
-            
-            for i in range(detections.shape[2]):
-                confidence = detections[0, 0, i, 2]
-                
-                if confidence > self.detection_config['confidence_threshold']:
-                    class_id = int(detections[0, 0, i, 1])
-                    if class_id in self.emergency_classes:
-                        if confidence > highest_confidence:
-                            highest_confidence = confidence
-                            detected_situation = self.emergency_classes[class_id]
-            
-            if detected_situation:
-                log_detection(detected_situation, highest_confidence)
-                return detected_situation, highest_confidence
-            else:
-                return None, 0
-                
+            return self.infer(self.capture())
         except Exception as e:
             logger.error(f"Error in detection: {str(e)}")
             return None, 0
@@ -1,9 +1,73 @@
 import pygame
 import os
+import threading
+from collections import OrderedDict
 from omxplayer.player import OMXPlayer
 from utils import logger, load_config
 
+class MediaCache:
+    """LRU of loaded media; evicted entries are handed to `release` (e.g. to quit a paused player). Thread-safe."""
+    
+    def __init__(self, capacity, release=None):
+        self.capacity = capacity
+        self.release = release
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        
+    def get(self, name, load):
+        """Cached entry for name, loading and caching it on a miss"""
+        with self._lock:
+            if name in self._entries:
+                self._entries.move_to_end(name)
+                self.hits += 1
+                return self._entries[name]
+            self.misses += 1
+        return self.put(name, load())
+    
+    def take(self, name, load):
+        """Like get, but removes the entry, for media that is used up by playing it"""
+        with self._lock:
+            if name in self._entries:
+                self.hits += 1
+                return self._entries.pop(name)
+            self.misses += 1
+        return load()
+    
+    def put(self, name, item):
+        with self._lock:
+            replaced = self._entries.pop(name, None)
+            self._entries[name] = item
+            evicted = [replaced] if replaced is not None and replaced is not item else []
+            while len(self._entries) > self.capacity:
+                evicted.append(self._entries.popitem(last=False)[1])
+        if self.release:
+            for entry in evicted:
+                self.release(entry)
+        return item
+    
+    def __contains__(self, name):
+        with self._lock:
+            return name in self._entries
+    
+    def clear(self):
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries.clear()
+        if self.release:
+            for item in entries:
+                self.release(item)
+    
+    def __len__(self):
+        return len(self._entries)
+
 class DisplayManager:
+    """
+    Shows guidance without blocking the caller: show_video/show_graphic start playback and return, update()
+    (called from the main loop) advances it, and starting new guidance cancels whatever is on screen.
+    """
+    
     def __init__(self):
         self.config = load_config()
         self.display_config = self.config['display']
@@ -25,22 +89,95 @@ class DisplayManager:
         os.makedirs(self.videos_dir, exist_ok=True)
         os.makedirs(self.images_dir, exist_ok=True)
         
+        # Situation -> {"video" or "image": media name}, the guidance shown for each detection
+        self.guidance = self.display_config.get('guidance', {})
+        
+        # Images are kept scaled to the screen, videos as paused players ready to start
+        self.images = MediaCache(self.display_config.get('image_cache_size', 8))
+        self.videos = MediaCache(self.display_config.get('video_cache_size', 2), release=self._quit_player)
+        self.current = None
+        self.preloaded = set()  # videos kept ready to play
+        self._closed = False
+        self.preload()
+        
+    def _media_path(self, kind, name):
+        if kind == 'video':
+            return os.path.join(self.videos_dir, f"{name}.mp4")
+        return os.path.join(self.images_dir, f"{name}.png")
+    
+    def preload(self):
+        """Fill the caches with the guidance media, in config order, up to their capacity"""
+        for situation, media in self.guidance.items():
+            for kind, name in media.items():
+                cache, load = (self.videos, self._open_player) if kind == 'video' else (self.images, self._load_image)
+                path = self._media_path(kind, name)
+                if not os.path.exists(path):
+                    logger.warning(f"Guidance for {situation} not found: {path}")
+                    continue
+                if len(cache) >= cache.capacity or name in cache:
+                    continue
+                try:
+                    cache.put(name, load(path))
+                    if kind == 'video':
+                        self.preloaded.add(name)
+                except Exception as e:
+                    logger.error(f"Error preloading {path}: {str(e)}")
+        logger.info(f"Preloaded {len(self.images)} images and {len(self.videos)} videos")
+    
+    def _reopen_player(self, video_name):
+        """Open a paused player for video_name in the background, so its next play starts warm"""
+        def reopen():
+            try:
+                player = self._open_player(self._media_path('video', video_name))
+                if self._closed:
+                    self._quit_player(player)
+                else:
+                    self.videos.put(video_name, player)
+            except Exception as e:
+                logger.error(f"Error reopening {video_name}: {str(e)}")
+        threading.Thread(target=reopen, name=f"reopen-{video_name}", daemon=True).start()
+    
+    def _load_image(self, image_path):
+        image = pygame.image.load(image_path).convert()
+        return pygame.transform.scale(image, self.screen.get_size())
+    
+    def _open_player(self, video_path):
+        return OMXPlayer(video_path, pause=True)
+    
+    def _quit_player(self, player):
+        try:
+            player.quit()
+        except Exception as e:
+            logger.error(f"Error stopping video: {str(e)}")
+    
+    @property
+    def busy(self):
+        """True while guidance or a message is on screen"""
+        return self.current is not None
+        
+    def show_guidance(self, situation):
+        """Show the configured guidance for a situation; False if there is none"""
+        media = self.guidance.get(situation, {})
+        if 'video' in media:
+            self.show_video(media['video'])
+        elif 'image' in media:
+            self.show_graphic(media['image'])
+        else:
+            return False
+        return True
+    
     def show_video(self, video_name):
-        """Display a video using OMXPlayer"""
-        video_path = os.path.join(self.videos_dir, f"{video_name}.mp4")
+        """Start a video using OMXPlayer"""
+        video_path = self._media_path('video', video_name)
+        self.stop()
         try:
             if os.path.exists(video_path):
-                player = OMXPlayer(video_path)
+                player = self.videos.take(video_name, lambda: self._open_player(video_path))
                 player.play()
-                # Wait for video to finish
-                while player.is_playing():
-                    # Handle pygame events to prevent freezing
-                    for event in pygame.event.get():
-                        if event.type == pygame.QUIT:
-                            player.quit()
-                            return
-                    pygame.time.wait(100)
-                player.quit()
+                # Playing uses the player up; a preloaded video gets a fresh paused one for its next play
+                if video_name in self.preloaded:
+                    self._reopen_player(video_name)
+                self.current = {"kind": "video", "name": video_name, "player": player}
             else:
                 logger.error(f"Video not found: {video_path}")
                 self.show_error_message(f"Video not found: {video_name}")
@@ -49,26 +186,16 @@ class DisplayManager:
             self.show_error_message("Error playing video")
             
     def show_graphic(self, image_name):
-        """Display an image using Pygame"""
-        image_path = os.path.join(self.images_dir, f"{image_name}.png")
+        """Show an image using Pygame for image_display_time"""
+        image_path = self._media_path('image', image_name)
+        self.stop()
         try:
             if os.path.exists(image_path):
-                # Load and scale image to fit screen
-                image = pygame.image.load(image_path)
-                image = pygame.transform.scale(image, self.screen.get_size())
-                
-                # Display image
+                image = self.images.get(image_name, lambda: self._load_image(image_path))
                 self.screen.blit(image, (0, 0))
                 pygame.display.flip()
-                
-                # Wait for configured time
-                start_time = pygame.time.get_ticks()
-                while pygame.time.get_ticks() - start_time < self.display_config['image_display_time']:
-                    # Handle pygame events
-                    for event in pygame.event.get():
-                        if event.type == pygame.QUIT:
-                            return
-                    pygame.time.wait(100)
+                self.current = {"kind": "image", "name": image_name,
+                                "until": pygame.time.get_ticks() + self.display_config['image_display_time']}
             else:
                 logger.error(f"Image not found: {image_path}")
                 self.show_error_message(f"Image not found: {image_name}")
@@ -77,7 +204,7 @@ class DisplayManager:
             self.show_error_message("Error displaying image")
     
     def show_error_message(self, message):
-        """Display an error message on screen"""
+        """Show an error message on screen for 3 seconds"""
         try:
             # Clear screen
             self.screen.fill((0, 0, 0))
@@ -90,15 +217,49 @@ class DisplayManager:
             # Display text
             self.screen.blit(text, text_rect)
             pygame.display.flip()
-            
-            # Wait for 3 seconds
-            pygame.time.wait(3000)
+            self.current = {"kind": "message", "name": message, "until": pygame.time.get_ticks() + 3000}
         except Exception as e:
             logger.error(f"Error showing error message: {str(e)}")
+    
+    def update(self):
+        """Handle pygame events and end guidance that has finished. Returns True while something is showing"""
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                self.stop()
+        if self.current is None:
+            return False
+        if self.current["kind"] == "video":
+            try:
+                finished = not self.current["player"].is_playing()
+            except Exception:
+                finished = True  # the player process exits at the end of the video
+        else:
+            finished = pygame.time.get_ticks() >= self.current["until"]
+        if finished:
+            self.stop()
+        return self.busy
+    
+    def stop(self):
+        """Cancel whatever is on screen"""
+        if self.current is None:
+            return
+        if self.current["kind"] == "video":
+            self._quit_player(self.current["player"])
+        self.current = None
+        if not pygame.display.get_init():
+            return
+        try:
+            self.screen.fill((0, 0, 0))
+            pygame.display.flip()
+        except Exception as e:
+            logger.error(f"Error clearing screen: {str(e)}")
             
     def __del__(self):
-        """Clean up pygame resources"""
+        """Clean up players and pygame resources"""
         try:
+            self._closed = True
+            self.stop()
+            self.videos.clear()
             pygame.quit()
         except Exception as e:
             logger.error(f"Error quitting pygame: {str(e)}") 
\ No newline at end of file
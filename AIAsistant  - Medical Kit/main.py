@@ -2,7 +2,8 @@ import time
 import sys
 from camera import CameraDetector
 from display import DisplayManager
-from utils import logger, load_config, ensure_assets_exist, check_system_health
+from pipeline import DetectionPipeline, SituationTracker
+from utils import logger, load_config, ensure_assets_exist, HealthSampler
 
 def main():
     try:
@@ -17,6 +18,20 @@ def main():
         camera = CameraDetector()
         display = DisplayManager()
         
+        # Guidance starts once per sustained situation rather than on every flickering detection
+        smoothing = config['detection'].get('smoothing', {})
+        tracker = SituationTracker(smoothing.get('window', 10), smoothing.get('enter', 6), smoothing.get('exit', 3))
+        
+        # System metrics and loop timings are sampled in the background, health checks only read them
+        system_config = config['system']
+        sampler = HealthSampler(system_config.get('sample_interval', 5), system_config.get('history_size', 720),
+                                system_config.get('metrics_log')).start()
+        
+        # Capture and inference run on their own threads; the loop below only reacts to detections
+        detection_config = config['detection']
+        pipeline = DetectionPipeline(camera, detection_config.get('queue_size', 1), tracker, sampler,
+                                     detection_config.get('detection_interval', 0.5)).start()
+        
         logger.info("System ready. Starting detection loop...")
         print("Smart First Aid Kit Assistant is running...")
         print("Press Ctrl+C to exit")
@@ -28,33 +43,28 @@ def main():
                 # Perform periodic health check
                 current_time = time.time()
                 if current_time - last_health_check >= config['system']['health_check_interval']:
-                    health_status = check_system_health()
+                    config = load_config()  # cached, picks up edits to config.json
+                    health_status = sampler.status(config['system'])
                     if health_status['status'] == 'warning':
                         logger.warning(f"System health issues detected: {health_status['issues']}")
                     last_health_check = current_time
                 
-                # Detect situation
-                situation, confidence = camera.detect_situation()
+                # Keep guidance playing and the window responsive while waiting for the next detection
+                display_start = time.monotonic()
+                display.update()
+                display_ms = (time.monotonic() - display_start) * 1000
+                detection = pipeline.next_detection(timeout=config['display'].get('refresh_interval', 0.1))
                 
-                if situation:
+                if detection:
+                    situation, confidence, _ = detection
                     logger.info(f"Detected situation: {situation} (confidence: {confidence:.2f})")
+                    display_start = time.monotonic()
                     
-                    # Show appropriate media
-                    if situation == "CPR":
-                        display.show_video("cpr_guide")
-                    elif situation == "Tourniquet":
-                        display.show_graphic("tourniquet_steps")
-                    elif situation == "Choking":
-                        display.show_video("choking_guide")
-                    elif situation == "Bleeding":
-                        display.show_video("bleeding_guide")
-                    elif situation == "Burn":
-                        display.show_graphic("burn_treatment")
-                    else:
+                    # Show appropriate media (display.guidance in config.json)
+                    if not display.show_guidance(situation):
                         logger.warning(f"No media found for situation: {situation}")
-                
-                # Wait before next detection
-                time.sleep(config['detection']['detection_interval'])
+                    display_ms += (time.monotonic() - display_start) * 1000
+                sampler.record_timing("display", display_ms)
                 
             except KeyboardInterrupt:
                 raise
@@ -72,6 +82,9 @@ def main():
     finally:
         # Clean up resources
         try:
+            pipeline.stop()
+            sampler.stop()
+            logger.info(f"Pipeline stats: {pipeline.stats()}")
             del camera
             del display
         except Exception as e:
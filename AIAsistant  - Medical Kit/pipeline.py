@@ -0,0 +1,205 @@
+import threading
+import time
+from collections import deque
+from queue import Empty
+from utils import logger
+
+class LatestFrameQueue:
+    """Bounded queue where a new item pushes out the oldest one instead of blocking the producer"""
+
+    def __init__(self, maxsize=1):
+        self._items = deque(maxlen=maxsize)
+        self._cond = threading.Condition()
+        self.dropped = 0
+
+    def put(self, item):
+        with self._cond:
+            if len(self._items) == self._items.maxlen:
+                self.dropped += 1
+            self._items.append(item)
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """Oldest item still queued; raises queue.Empty after timeout seconds"""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._items, timeout):
+                raise Empty
+            return self._items.popleft()
+
+class SituationTracker:
+    """
+    Votes over the last `window` frames with enter/exit hysteresis: a situation becomes active once it wins
+    at least `enter` frames, stays active until it drops below `exit`, and is replaced early only by another
+    situation that has reached `enter` with more votes. update() reports each activation exactly once.
+    """
+
+    def __init__(self, window=10, enter=6, exit=3):
+        if not 0 < exit <= enter <= window:
+            raise ValueError(f"Need 0 < exit <= enter <= window, got {exit}, {enter}, {window}")
+        self.window = deque(maxlen=window)
+        self.enter = enter
+        self.exit = exit
+        self.active = None
+        self.activations = 0
+
+    def votes(self):
+        counts = {}
+        for situation, _ in self.window:
+            if situation:
+                counts[situation] = counts.get(situation, 0) + 1
+        return counts
+
+    def update(self, situation, confidence):
+        """Feed one frame's result; returns (situation, mean confidence) when a situation becomes active, else None"""
+        self.window.append((situation, confidence))
+        counts = self.votes()
+        if self.active and counts.get(self.active, 0) < self.exit:
+            self.active = None
+        leader = max(counts, key=counts.get, default=None)
+        if leader is None or leader == self.active or counts[leader] < self.enter:
+            return None
+        if self.active and counts[leader] <= counts[self.active]:
+            return None
+        self.active = leader
+        self.activations += 1
+        confidences = [c for s, c in self.window if s == leader]
+        return leader, sum(confidences) / len(confidences)
+
+class DetectionPipeline:
+    """
+    Capture and inference on their own threads. Frames go through a latest-frame-wins queue, so the
+    detector always works on the newest frame, and detections are published to the main loop the same way.
+    With a tracker only newly activated situations are published, otherwise every detection is.
+    Inference runs at most once every `interval` seconds (0: as fast as the detector allows). A frame is only
+    captured when the inference thread will want one, timed to be ready when its next pass is due, so capture
+    never runs faster than inference.
+    """
+
+    def __init__(self, detector, queue_size=1, tracker=None, sampler=None, interval=0.0):
+        self.detector = detector
+        self.tracker = tracker
+        self.sampler = sampler
+        self.interval = interval
+        self.frames = LatestFrameQueue(queue_size)
+        self.detections = LatestFrameQueue(1)
+        self.captured = 0
+        self.inferred = 0
+        self.latency_total = 0.0
+        self._running = threading.Event()
+        self._stopping = threading.Event()
+        self._frame_wanted = threading.Event()
+        self._next_run = 0.0
+        self._capture_seconds = 0.0
+        self._infer_seconds = 0.0
+        self._threads = []
+        self._started = None
+
+    def start(self):
+        self._running.set()
+        self._stopping.clear()
+        self._started = time.monotonic()
+        self._next_run = self._started
+        self._frame_wanted.set()
+        self._threads = [
+            threading.Thread(target=self._capture_loop, name="capture", daemon=True),
+            threading.Thread(target=self._inference_loop, name="inference", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        self._running.clear()
+        self._stopping.set()
+        self._frame_wanted.set()
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self._threads = []
+
+    def _capture_loop(self):
+        while self._running.is_set():
+            if not self._frame_wanted.wait(timeout=0.5):
+                continue
+            # Start the grab one capture time before the next pass is due, so the frame is fresh but ready
+            if self._stopping.wait(max(0.0, self._next_run - self._capture_seconds - time.monotonic())):
+                break
+            self._frame_wanted.clear()
+            try:
+                start = time.monotonic()
+                frame = self.detector.capture()
+            except EOFError:
+                logger.info("Video source exhausted, capture stopped")
+                break
+            except Exception as e:
+                logger.error(f"Error capturing frame: {str(e)}")
+                self._frame_wanted.set()
+                time.sleep(0.1)
+                continue
+            captured_at = time.monotonic()
+            self._capture_seconds = captured_at - start
+            self.frames.put((captured_at, frame))
+            self.captured += 1
+            if self.sampler is not None:
+                self.sampler.record_timing("capture", (captured_at - start) * 1000)
+
+    def _inference_loop(self):
+        next_run = time.monotonic()
+        while self._running.is_set():
+            # Pace the forward passes; the capture thread grabs the next frame shortly before each is due
+            if self._stopping.wait(max(0.0, next_run - time.monotonic())):
+                break
+            try:
+                captured_at, frame = self.frames.get(timeout=0.5)
+            except Empty:
+                continue
+            start = time.monotonic()
+            next_run = start + self.interval
+            # The next frame is wanted when this pass ends, or at the next slot if that is later
+            self._next_run = start + max(self.interval, self._infer_seconds)
+            self._frame_wanted.set()
+            try:
+                situation, confidence = self.detector.infer(frame)
+            except Exception as e:
+                logger.error(f"Error in detection: {str(e)}")
+                continue
+            self._infer_seconds = time.monotonic() - start
+            if self.sampler is not None:
+                self.sampler.record_timing("inference", (time.monotonic() - start) * 1000)
+            self.inferred += 1
+            self.latency_total += time.monotonic() - captured_at
+            if self.tracker is not None:
+                activated = self.tracker.update(situation, confidence)
+                if activated:
+                    self.detections.put((*activated, captured_at))
+            elif situation:
+                self.detections.put((situation, confidence, captured_at))
+
+    def next_detection(self, timeout=None):
+        """(situation, confidence, capture time) of the newest detection, or None after timeout seconds"""
+        try:
+            return self.detections.get(timeout)
+        except Empty:
+            return None
+
+    def stats(self):
+        elapsed = time.monotonic() - self._started if self._started else 0.0
+        # Frames the scene gate skipped repeat the last result without a forward pass; only real passes count
+        # towards detection_fps
+        forward_passes = getattr(self.detector, "forward_passes", self.inferred)
+        stats = {
+            "captured": self.captured,
+            "inferred": self.inferred,
+            "forward_passes": forward_passes,
+            "gated": self.inferred - forward_passes,
+            "dropped": self.frames.dropped,
+            "capture_fps": self.captured / elapsed if elapsed else 0.0,
+            "frame_fps": self.inferred / elapsed if elapsed else 0.0,
+            "detection_fps": forward_passes / elapsed if elapsed else 0.0,
+            "mean_latency": self.latency_total / self.inferred if self.inferred else 0.0,
+        }
+        gate = getattr(self.detector, "gate", None)
+        if gate is not None:
+            stats["gate"] = gate.stats()
+        if self.tracker is not None:
+            stats["activations"] = self.tracker.activations
+        return stats
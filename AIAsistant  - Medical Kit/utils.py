@@ -1,7 +1,10 @@
+import copy
 import logging
 import os
 import json
+import threading
 import psutil
+from collections import deque
 from datetime import datetime
 
 # Configure logging
@@ -16,32 +19,65 @@ logging.basicConfig(
 
 logger = logging.getLogger('FirstAidAssistant')
 
+_config_cache = {"mtime": None, "config": None}
+_config_lock = threading.Lock()
+
 def load_config():
-    """Load configuration from config.json"""
+    """Load configuration from config.json, re-reading the file only when it has changed"""
     config_path = os.path.join(os.path.dirname(__file__), 'config.json')
     try:
-        with open(config_path, 'r') as f:
-            return json.load(f)
+        mtime = os.stat(config_path).st_mtime_ns
+        with _config_lock:
+            if _config_cache["mtime"] != mtime:
+                with open(config_path, 'r') as f:
+                    _config_cache["config"] = json.load(f)
+                _config_cache["mtime"] = mtime
+            # Callers may modify their copy
+            return copy.deepcopy(_config_cache["config"])
     except FileNotFoundError:
         logger.warning("Config file not found, using default settings")
         return {
             "camera": {
                 "resolution": (640, 480),
-                "fps": 30
+                "fps": 30,
+                "source": None  # video file to replay instead of the Pi camera
             },
             "display": {
                 "image_display_time": 5000,
-                "fullscreen": True
+                "fullscreen": True,
+                "refresh_interval": 0.1,  # seconds between display updates in the main loop
+                "image_cache_size": 8,  # images kept scaled to the screen
+                "video_cache_size": 2,  # videos kept open and paused, ready to play
+                "guidance": {  # media shown for each situation, preloaded in this order
+                    "Tourniquet": {"video": "torquinet video", "image": "torquinet"},
+                    "Bleeding": {"image": "bandages"}
+                }
             },
             "detection": {
                 "confidence_threshold": 0.7,
-                "detection_interval": 2
+                "detection_interval": 0.5,  # minimum seconds between inference runs
+                "queue_size": 1,  # frames waiting for inference, older ones are dropped
+                "gating": {
+                    "enabled": True,
+                    "threshold": 6.0,  # mean grey-level change that counts as a new scene
+                    "max_staleness": 5.0,  # seconds before inference runs anyway
+                    "size": (64, 48)
+                },
+                "smoothing": {
+                    "window": 10,  # frames voting on the current situation
+                    "enter": 6,  # votes needed to start guidance
+                    "exit": 3  # guidance ends when votes drop below this
+                }
             },
             "system": {
                 "health_check_interval": 300,  # 5 minutes
                 "max_cpu_usage": 80,  # percentage
                 "max_memory_usage": 80,  # percentage
-                "min_disk_space": 1000  # MB
+                "min_disk_space": 1000,  # MB
+                "max_temperature": 80,  # Celsius
+                "sample_interval": 5,  # seconds between background health samples
+                "history_size": 720,  # samples kept in memory (an hour at 5 s)
+                "metrics_log": None  # JSONL file every sample is appended to
             }
         }
 
@@ -69,39 +105,62 @@ def ensure_assets_exist():
             os.makedirs(directory)
             logger.info(f"Created directory: {directory}")
 
-def check_system_health():
-    """Check system resources and return health status"""
-    config = load_config()
-    system_config = config.get('system', {})
-    
+def read_temperature():
+    """Highest current reading of the board's temperature sensors in Celsius, None where there are none"""
+    try:
+        sensors = psutil.sensors_temperatures()
+    except (AttributeError, OSError):
+        return None
+    readings = [entry.current for entries in sensors.values() for entry in entries]
+    return max(readings) if readings else None
+
+def collect_metrics(cpu_interval=None):
+    """
+    One sample of CPU, memory, disk and temperature. With cpu_interval=None the CPU figure covers the time
+    since the previous call instead of blocking to measure it.
+    """
+    disk = psutil.disk_usage('/')
+    return {
+        "cpu_usage": psutil.cpu_percent(interval=cpu_interval),
+        "memory_usage": psutil.virtual_memory().percent,
+        "free_disk_space_mb": disk.free / (1024 * 1024),
+        "temperature": read_temperature()
+    }
+
+def evaluate_health(metrics, system_config):
+    """Health status for a metrics sample against the thresholds in the system config"""
     health_status = {
         "status": "healthy",
         "issues": [],
-        "metrics": {}
+        "metrics": metrics
     }
     
+    if metrics["cpu_usage"] > system_config.get("max_cpu_usage", 80):
+        health_status["status"] = "warning"
+        health_status["issues"].append(f"High CPU usage: {metrics['cpu_usage']}%")
+    
+    if metrics["memory_usage"] > system_config.get("max_memory_usage", 80):
+        health_status["status"] = "warning"
+        health_status["issues"].append(f"High memory usage: {metrics['memory_usage']}%")
+    
+    if metrics["free_disk_space_mb"] < system_config.get("min_disk_space", 1000):
+        health_status["status"] = "warning"
+        health_status["issues"].append(f"Low disk space: {metrics['free_disk_space_mb']:.2f}MB")
+    
+    temperature = metrics.get("temperature")
+    if temperature is not None and temperature > system_config.get("max_temperature", 80):
+        health_status["status"] = "warning"
+        health_status["issues"].append(f"High temperature: {temperature:.1f}C")
+    
+    return health_status
+
+def check_system_health():
+    """Check system resources and return health status (blocks for a second to measure CPU usage)"""
+    config = load_config()
+    system_config = config.get('system', {})
+    
     try:
-        # Check CPU usage
-        cpu_percent = psutil.cpu_percent(interval=1)
-        health_status["metrics"]["cpu_usage"] = cpu_percent
-        if cpu_percent > system_config.get("max_cpu_usage", 80):
-            health_status["status"] = "warning"
-            health_status["issues"].append(f"High CPU usage: {cpu_percent}%")
-        
-        # Check memory usage
-        memory = psutil.virtual_memory()
-        health_status["metrics"]["memory_usage"] = memory.percent
-        if memory.percent > system_config.get("max_memory_usage", 80):
-            health_status["status"] = "warning"
-            health_status["issues"].append(f"High memory usage: {memory.percent}%")
-        
-        # Check disk space
-        disk = psutil.disk_usage('/')
-        free_space_mb = disk.free / (1024 * 1024)
-        health_status["metrics"]["free_disk_space_mb"] = free_space_mb
-        if free_space_mb < system_config.get("min_disk_space", 1000):
-            health_status["status"] = "warning"
-            health_status["issues"].append(f"Low disk space: {free_space_mb:.2f}MB")
+        health_status = evaluate_health(collect_metrics(cpu_interval=1), system_config)
         
         # Log health status
         if health_status["status"] == "warning":
@@ -117,4 +176,85 @@ def check_system_health():
             "status": "error",
             "issues": [f"Health check failed: {str(e)}"],
             "metrics": {}
-        } 
\ No newline at end of file
+        }
+
+class HealthSampler:
+    """
+    Background thread that samples system metrics every `interval` seconds into a ring buffer of the last
+    `history_size` samples, together with the detection-loop stage timings recorded since the previous sample.
+    Readers get the latest sample without blocking; with `log_path` every sample is also appended there as JSONL.
+    """
+    
+    def __init__(self, interval=5, history_size=720, log_path=None):
+        self.interval = interval
+        self.history = deque(maxlen=history_size)
+        self.log_path = log_path
+        self._timings = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        
+    def start(self):
+        psutil.cpu_percent(interval=None)  # the first non-blocking reading is meaningless, prime it
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="health", daemon=True)
+        self._thread.start()
+        return self
+    
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+    
+    def record_timing(self, stage, ms):
+        """Add one duration (e.g. capture, inference, display) to the current sampling period"""
+        with self._lock:
+            count, total, peak = self._timings.get(stage, (0, 0.0, 0.0))
+            self._timings[stage] = (count + 1, total + ms, max(peak, ms))
+    
+    def sample(self):
+        """Take one sample now and add it to the ring buffer"""
+        entry = {"timestamp": datetime.now().isoformat(timespec="seconds")}
+        entry.update(collect_metrics())
+        with self._lock:
+            timings, self._timings = self._timings, {}
+        for stage, (count, total, peak) in timings.items():
+            entry[f"{stage}_ms"] = total / count
+            entry[f"{stage}_max_ms"] = peak
+            entry[f"{stage}_count"] = count
+        with self._lock:
+            self.history.append(entry)
+        if self.log_path:
+            with open(self.log_path, 'a') as f:
+                f.write(json.dumps(entry) + "\n")
+        return entry
+    
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.sample()
+            except Exception as e:
+                logger.error(f"Error sampling system health: {str(e)}")
+            self._stop.wait(self.interval)
+    
+    def latest(self):
+        """Most recent sample, or None before the first one"""
+        with self._lock:
+            return self.history[-1] if self.history else None
+    
+    def status(self, system_config):
+        """Health status of the most recent sample, without measuring anything"""
+        latest = self.latest()
+        if latest is None:
+            return {"status": "healthy", "issues": [], "metrics": {}}
+        return evaluate_health(latest, system_config)
+    
+    def export_jsonl(self, path):
+        """Write the buffered samples to path, one JSON object per line; returns how many were written"""
+        with self._lock:
+            samples = list(self.history)
+        with open(path, 'w') as f:
+            for entry in samples:
+                f.write(json.dumps(entry) + "\n")
+        return len(samples) 
\ No newline at end of file
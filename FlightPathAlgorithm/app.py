@@ -0,0 +1,114 @@
+import argparse
+from flask import Flask, jsonify, request
+from path_util import onecall_key, NEIGHBOURS
+from planner import Planner, load_stations
+from dispatch_util import StationRouter, batch_dispatch
+from energy_util import pack_wh
+from cache_util import RouteCache
+from beacon_util import BeaconIngest, serve
+from weather_util import StubWeather, OneCallWeather, FileWeather, WeatherCache
+
+app = Flask(__name__)
+planner = None
+beacons = None
+router = None
+pack = None
+
+
+@app.route("/health")
+def health():
+    return jsonify({"status": "ok", "stations": [s["id"] for s in planner.stations],
+                    "routeCache": planner.route_cache.stats(), "beacons": beacons.stats() if beacons else None})
+
+
+@app.route("/alerts")
+def alerts():
+    # Recent beacon alerts, with their route once it is planned
+    recent = []
+    for alert in list(beacons.alerts) if beacons else []:
+        entry = {k: v for k, v in alert.items() if k != "route"}
+        future = alert.get("route")
+        if future is not None and future.done():
+            entry["route"] = None if future.exception() else future.result()
+        recent.append(entry)
+    return jsonify(recent)
+
+
+@app.route("/route", methods=["POST"])
+def route():
+    payload = request.get_json(silent=True)
+    if payload is None:
+        return jsonify({"error": "Expected a JSON body"}), 400
+    try:
+        futures = planner.submit_many(payload) if isinstance(payload, list) else [planner.submit(payload)]
+        routes = [future.result() for future in futures]
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        app.logger.exception("Route planning failed")
+        return jsonify({"error": f"Route planning failed: {e}"}), 500
+    return jsonify(routes if isinstance(payload, list) else routes[0])
+
+
+@app.route("/dispatch", methods=["POST"])
+def dispatch():
+    # {"incidents": [[lat, lon], ...], "drones": [...drones.json], "stations": [...stations.json]}
+    payload = request.get_json(silent=True) or {}
+    try:
+        incidents = [(float(lat), float(lon)) for lat, lon in payload["incidents"]]
+        stations = payload["stations"]
+        for station in stations:
+            station["cell"] = planner.goal_cell(station["lat"], station["lon"])
+        wind_vector = planner.wind(*incidents[0]) if incidents else None
+        result = batch_dispatch(planner.dem, incidents, payload["drones"], stations, wind_vector=wind_vector,
+                                pack_wh=pack, grid=planner.grid,
+                                costs=planner.costs(wind_vector) if incidents else None, router=router)
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({"error": f"Bad dispatch request: {e}"}), 400
+    except Exception as e:
+        app.logger.exception("Dispatch failed")
+        return jsonify({"error": f"Dispatch failed: {e}"}), 500
+    return jsonify(result)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="LifeDrop route planning service")
+    parser.add_argument("--dem", default="output_4.tiff")
+    parser.add_argument("--stations", help="stations.json to dispatch from (default: Bovec, Trenta, Bohinjska Bistrica)")
+    parser.add_argument("--offline", action="store_true", help="use a calm-wind stub instead of OpenWeather")
+    parser.add_argument("--wind-file", help="JSON wind samples to use instead of OpenWeather (see wind_samples.json)")
+    parser.add_argument("--wind-field", action="store_true", help="plan with a per-cell wind raster over the DEM")
+    parser.add_argument("--any-angle", action="store_true", help="send line-of-sight waypoints instead of every cell")
+    parser.add_argument("--drop-radius", type=int, default=8,
+                        help="fly to the nearest safe drop cell within this many cells of an alert, 0 to disable")
+    parser.add_argument("--cache-radius", type=int, default=4, help="cells within which alerts share a cached route")
+    parser.add_argument("--beacon-port", type=int, help="accept beacon message lines on this TCP port")
+    parser.add_argument("--beacon-window", type=float, default=60.0,
+                        help="seconds within which repeat presses of one beacon are a single alert")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--dispatch-workers", type=int, help="processes for /dispatch routing (default: one per CPU)")
+    parser.add_argument("--pack", type=float, default=pack_wh(), metavar="WH",
+                        help="full battery pack for /dispatch (default: energy_util.pack_wh(), about 98 Wh)")
+    parser.add_argument("--port", type=int, default=5000)
+    args = parser.parse_args()
+
+    if args.wind_file:
+        weather = FileWeather(args.wind_file)
+    elif args.offline or not onecall_key:
+        weather = StubWeather()
+    else:
+        weather = OneCallWeather(onecall_key)
+    weather = WeatherCache(weather)
+    stations = load_stations(args.stations) if args.stations else None
+    planner = Planner(args.dem, stations=stations, weather=weather, workers=args.workers,
+                      wind_lattice=(3, 3) if args.wind_field else None, any_angle=args.any_angle,
+                      route_cache=RouteCache(radius=args.cache_radius), drop_radius=args.drop_radius or None)
+    router = StationRouter((len(NEIGHBOURS), *planner.dem.shape), workers=args.dispatch_workers)
+    pack = args.pack
+    if args.beacon_port:
+        beacons = BeaconIngest(planner, window=args.beacon_window)
+        serve(beacons, port=args.beacon_port)
+    try:
+        app.run(port=args.port, threaded=True)
+    finally:
+        router.close()
@@ -0,0 +1,226 @@
+import socketserver
+import threading
+from collections import deque
+import numpy as np
+
+# KIM1 payload of LifeDropBeacon/LifeDrop.ino: latitude and longitude as dtostrf(value, 0, 6) ASCII, NUL padded,
+# in bytes 0-10 and 11-21, then a check byte. The modem sends it as 46 hex characters.
+PAYLOAD_DTYPE = np.dtype([("lat", "S11"), ("lon", "S11"), ("check", "u1")])
+HEX_LENGTH = 2 * PAYLOAD_DTYPE.itemsize
+CHECK_BYTE = 42
+# simLatitude/simLongitude, what the firmware sends when it has no GPS fix
+FALLBACK_LAT, FALLBACK_LON = 41.6478, 20.7506
+
+# Per-message status codes; NO_CELL is an alert inside the DEM with no terrain (only nodata) within snap range
+OK, BAD_FORMAT, BAD_CHECK, BAD_COORDS, DUPLICATE, FALLBACK, OUTSIDE_DEM, NO_CELL = range(8)
+STATUS_NAMES = ("ok", "bad_format", "bad_check", "bad_coords", "duplicate", "fallback", "outside_dem", "no_cell")
+
+_NIBBLE = np.full(256, 255, dtype=np.uint8)
+_NIBBLE[np.frombuffer(b"0123456789", np.uint8)] = np.arange(10)
+_NIBBLE[np.frombuffer(b"ABCDEF", np.uint8)] = np.arange(10, 16)
+_NIBBLE[np.frombuffer(b"abcdef", np.uint8)] = np.arange(10, 16)
+
+
+def encode_payload(lat, lon):
+    # The firmware's sendPayload as hex, for tests and the benchmark
+    payload = bytearray(PAYLOAD_DTYPE.itemsize)
+    for offset, value in ((0, lat), (11, lon)):
+        text = f"{value:.6f}".encode()[:11]
+        payload[offset:offset + len(text)] = text
+    payload[22] = CHECK_BYTE
+    return payload.hex().upper()
+
+
+def unhex(payloads):
+    # (n, 23) uint8 records from hex payloads (str or bytes) through a nibble lookup table, plus a mask of the
+    # ones that were HEX_LENGTH hex characters
+    raw = np.array([p.encode("ascii", "replace") if isinstance(p, str) else bytes(p) for p in payloads],
+                   dtype=f"S{HEX_LENGTH + 1}")
+    well_formed = np.char.str_len(raw) == HEX_LENGTH
+    chars = np.frombuffer(raw.astype(f"S{HEX_LENGTH}").tobytes(), np.uint8).reshape(len(raw), HEX_LENGTH)
+    nibbles = _NIBBLE[chars]
+    well_formed &= (nibbles != 255).all(axis=1)
+    return (nibbles[:, 0::2] << 4) | nibbles[:, 1::2], well_formed
+
+
+def parse_fields(fields):
+    # Float array from an S11 field array; unparsable entries become NaN. One astype for the whole batch, and
+    # only if that fails are the entries tried one by one.
+    try:
+        return fields.astype(np.float64)
+    except ValueError:
+        out = np.full(len(fields), np.nan)
+        for i, field in enumerate(fields):
+            try:
+                out[i] = float(field)
+            except ValueError:
+                pass
+        return out
+
+
+def decode_payloads(payloads):
+    # Bulk decode of hex payloads. Returns (lat, lon, status) arrays with status OK, BAD_FORMAT (wrong length or
+    # not hex), BAD_CHECK or BAD_COORDS (unparsable or out of range); lat/lon are NaN where status is not OK.
+    n = len(payloads)
+    lat, lon = np.full(n, np.nan), np.full(n, np.nan)
+    if n == 0:
+        return lat, lon, np.zeros(0, dtype=np.uint8)
+    binary, well_formed = unhex(payloads)
+    status = np.where(well_formed, OK, BAD_FORMAT).astype(np.uint8)
+    records = np.ascontiguousarray(binary).view(PAYLOAD_DTYPE).ravel()
+    status[well_formed & (records["check"] != CHECK_BYTE)] = BAD_CHECK
+    ok = status == OK
+    lat[ok], lon[ok] = parse_fields(records["lat"][ok]), parse_fields(records["lon"][ok])
+    with np.errstate(invalid="ignore"):
+        in_range = (np.abs(lat) <= 90) & (np.abs(lon) <= 180)
+    status[ok & ~in_range] = BAD_COORDS
+    lat[status != OK] = np.nan
+    lon[status != OK] = np.nan
+    return lat, lon, status
+
+
+def is_fallback(lat, lon):
+    return np.isclose(lat, FALLBACK_LAT, rtol=0, atol=5e-7) & np.isclose(lon, FALLBACK_LON, rtol=0, atol=5e-7)
+
+
+def first_presses(beacon_ids, times, window, last_seen):
+    # True for messages that open a new alert: more than `window` seconds after the previous message of the same
+    # beacon, in this batch or before it. last_seen (beacon id -> time of its latest message) carries that state
+    # across batches and is updated in place, so a beacon held down keeps extending its one alert.
+    fresh = np.zeros(len(times), dtype=bool)
+    if len(times) == 0:
+        return fresh
+    beacons, index = np.unique(beacon_ids, return_inverse=True)
+    order = np.lexsort((times, index))
+    sorted_index, sorted_times = index[order], times[order]
+    first = np.concatenate([[True], sorted_index[1:] != sorted_index[:-1]])
+    previous = np.empty_like(sorted_times)
+    previous[1:] = sorted_times[:-1]
+    seen = np.array([last_seen.get(b, -np.inf) for b in beacons.tolist()])
+    previous[first] = seen[sorted_index[first]]
+    fresh[order] = sorted_times - previous > window
+    last = np.nonzero(np.append(first[1:], True))[0]
+    for beacon, latest in zip(beacons[sorted_index[last]].tolist(), sorted_times[last].tolist()):
+        last_seen[beacon] = max(latest, last_seen.get(beacon, -np.inf))
+    return fresh
+
+
+def parse_lines(lines):
+    # "<unix time> <beacon id> <hex payload>" lines (bytes) as (times, beacon ids, payloads); lines that do not
+    # split into three fields get an empty payload and are reported as BAD_FORMAT
+    times, beacons, payloads = [], [], []
+    for line in lines:
+        fields = line.split()
+        if len(fields) == 3:
+            try:
+                times.append(float(fields[0]))
+                beacons.append(fields[1].decode("ascii", "replace"))
+                payloads.append(fields[2])
+                continue
+            except ValueError:
+                pass
+        times.append(np.nan)
+        beacons.append("")
+        payloads.append(b"")
+    return np.array(times, dtype=float), np.array(beacons, dtype=str), payloads
+
+
+def iter_batches(read, chunk_size=1 << 16):
+    # Lists of complete lines from a read(size) callable (file.read, socket.recv); each chunk read is one batch
+    pending = b""
+    while True:
+        chunk = read(chunk_size)
+        if not chunk:
+            break
+        lines = (pending + chunk).split(b"\n")
+        pending = lines.pop()
+        lines = [line for line in lines if line.strip()]
+        if lines:
+            yield lines
+    if pending.strip():
+        yield [pending]
+
+
+class BeaconIngest:
+    # Decodes batches of beacon messages, drops bad and repeated ones and hands new alerts to the planner.
+    # Alerts with the firmware's fallback coordinates are kept and flagged but not routed, the beacon has no fix.
+
+    def __init__(self, planner=None, window=60.0, history=1000):
+        self.planner = planner
+        self.window = window
+        self.last_seen = {}
+        self.counts = np.zeros(len(STATUS_NAMES), dtype=np.int64)
+        self.alerts = deque(maxlen=history)
+        self._lock = threading.Lock()
+
+    def ingest(self, times, beacon_ids, payloads):
+        # One batch of messages; returns the new alerts as dicts, routed ones with a "route" future
+        times = np.asarray(times, dtype=float)
+        beacon_ids = np.asarray(beacon_ids, dtype=str)
+        lat, lon, status = decode_payloads(payloads)
+        status[(status == OK) & ~np.isfinite(times)] = BAD_FORMAT
+        with self._lock:
+            ok = np.nonzero(status == OK)[0]
+            fresh = first_presses(beacon_ids[ok], times[ok], self.window, self.last_seen)
+            status[ok[~fresh]] = DUPLICATE
+            status[(status == OK) & is_fallback(lat, lon)] = FALLBACK
+            if self.planner is not None:
+                status[(status == OK) & ~self.planner.grid.contains(lat, lon)] = OUTSIDE_DEM
+            self.counts += np.bincount(status, minlength=len(STATUS_NAMES))
+        new = np.nonzero((status == OK) | (status == FALLBACK))[0]
+        alerts = [{"beaconId": str(beacon_ids[i]), "time": float(times[i]), "lat": float(lat[i]),
+                   "lon": float(lon[i]), "fallback": bool(status[i] == FALLBACK), "noCell": False} for i in new]
+        routed = [alert for alert in alerts if not alert["fallback"]]
+        if self.planner is not None and routed:
+            try:
+                futures = self.planner.submit_many(routed)
+            except ValueError:
+                # An alert with no terrain cell in reach fails the whole batch; route the alerts one by one instead
+                futures = [self._submit(alert) for alert in routed]
+            for alert, future in zip(routed, futures):
+                if future is not None:
+                    alert["route"] = future
+        self.alerts.extend(alerts)
+        return alerts
+
+    def _submit(self, alert):
+        # The route future for one alert, or None with the alert marked no_cell
+        try:
+            return self.planner.submit_many([alert])[0]
+        except ValueError as e:
+            alert["noCell"] = True
+            alert["error"] = str(e)
+            with self._lock:
+                self.counts[OK] -= 1
+                self.counts[NO_CELL] += 1
+            return None
+
+    def ingest_lines(self, lines):
+        return self.ingest(*parse_lines(lines))
+
+    def ingest_file(self, path, chunk_size=1 << 16):
+        alerts = []
+        with open(path, "rb") as f:
+            for lines in iter_batches(f.read, chunk_size):
+                alerts.extend(self.ingest_lines(lines))
+        return alerts
+
+    def stats(self):
+        with self._lock:
+            counts = {name: int(count) for name, count in zip(STATUS_NAMES, self.counts)}
+        counts["received"] = sum(counts.values())
+        return counts
+
+
+def serve(ingest, host="127.0.0.1", port=7070):
+    # TCP stand-in for the satellite backend: clients stream message lines and every chunk received is ingested as
+    # one batch. Returns the running server, stop it with shutdown().
+    class Handler(socketserver.BaseRequestHandler):
+        def handle(self):
+            for lines in iter_batches(self.request.recv):
+                ingest.ingest_lines(lines)
+
+    server = socketserver.ThreadingTCPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="beacon-server", daemon=True).start()
+    return server
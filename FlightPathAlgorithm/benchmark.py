@@ -0,0 +1,467 @@
+import argparse
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+import numpy as np
+from path_util import astar, reconstruct_path, wind_vector, start_points
+from search_util import astar_array, reconstruct_path_array, astar_bidirectional, astar_battery
+from energy_util import route_segments, route_energy, battery_budget, BATTERY_MAH, BATTERY_VOLTAGE
+from cost_util import get_edge_costs, edge_costs, mask_costs
+from field_util import multi_source_dijkstra, route_from_field
+from hierarchy_util import hierarchical_gap
+from dstar_util import DStarLite
+from los_util import simplify_path, path_time
+from beacon_util import encode_payload, decode_payloads, BeaconIngest, serve, STATUS_NAMES
+from landing_util import build_index, LandingIndex
+from dem_util import DEMManager
+IMPORT_BUDGET = 0.5  # s, cold import of the headless planner
+
+
+def synthetic_dem(h, w, seed=0):
+    # Layered block noise, roughly the relief of the Julian Alps at 47 m per pixel
+    rng = np.random.default_rng(seed)
+    z = np.zeros((h, w))
+    for scale in (64, 16, 4):
+        noise = rng.normal(size=(h // scale + 2, w // scale + 2))
+        z += np.kron(noise, np.ones((scale, scale)))[:h, :w] * scale * 8
+    return (z + 1500).astype(np.float32)
+
+
+def measure(fn, *args, **kwargs):
+    # Timed and traced in separate runs, tracemalloc would otherwise dominate the timing
+    t0 = time.perf_counter()
+    fn(*args, **kwargs)
+    elapsed = time.perf_counter() - t0
+    tracemalloc.start()
+    result = fn(*args, **kwargs)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def bench_astar(dem, start, goal):
+    stats = {}
+    (came_from, cost_so_far), t_dict, m_dict = measure(astar, dem, start, goal, wind_vector=wind_vector, stats=stats)
+    path = reconstruct_path(came_from, start, goal)
+    (pred, g), t_arr, m_arr = measure(astar_array, dem, start, goal, wind_vector=wind_vector)
+    path_arr = reconstruct_path_array(pred, start, goal, dem.shape)
+    assert path == path_arr, "array engine diverged from astar"
+    print(f"expanded {stats['expanded']}, pushed {stats['pushed']}, reopened {stats['reopened']}")
+    print(f"astar        {t_dict:8.2f} s  peak {m_dict / 2**20:8.1f} MiB  cost {cost_so_far[goal]:.2f} s")
+    print(f"astar_array  {t_arr:8.2f} s  peak {m_arr / 2**20:8.1f} MiB  cost {g[goal[0] * dem.shape[1] + goal[1]]:.2f} s")
+    print(f"speedup {t_dict / t_arr:.1f}x, peak memory {m_dict / m_arr:.1f}x lower, {len(path)} waypoints")
+
+
+def bench_dispatch(dem, goal):
+    costs = get_edge_costs(dem, wind_vector)
+    t0 = time.perf_counter()
+    best = min((astar_array(dem, s, goal, costs=costs)[1][goal[0] * dem.shape[1] + goal[1]], i)
+               for i, s in enumerate(start_points))
+    t_astar = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    field = multi_source_dijkstra(costs, start_points)
+    t_build = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    station, path, cost = route_from_field(field, goal)
+    t_lookup = time.perf_counter() - t0
+    assert station == best[1] and np.isclose(cost, best[0]), "dispatch field disagrees with per-station astar"
+    print(f"3x astar_array     {t_astar:8.3f} s")
+    print(f"field build (once) {t_build:8.3f} s")
+    print(f"field lookup       {t_lookup * 1000:8.3f} ms  station {station}, cost {cost:.2f} s")
+
+
+def bench_hierarchical(dem_manager, start, goal, factor=8, radius=2):
+    # The coarse level comes from the manager's overview pyramid, built before the clock starts
+    dem_manager.overview(factor)
+    t0 = time.perf_counter()
+    report = hierarchical_gap(dem_manager, start, goal, wind_vector, factor, radius)
+    elapsed = time.perf_counter() - t0
+    print(f"exact astar         cost {report['exact_cost']:9.2f} s  expanded {report['exact_expanded']:8d}")
+    print(f"hierarchical (x{factor})  cost {report['hierarchical_cost']:9.2f} s  "
+          f"expanded {report['hierarchical_expanded']:8d}")
+    print(f"gap {report['gap'] * 100:.2f}%, "
+          f"{report['exact_expanded'] / report['hierarchical_expanded']:.1f}x fewer expansions ({elapsed:.1f} s total)")
+
+
+def bench_bidirectional(dem, start, goal):
+    costs = get_edge_costs(dem, wind_vector)
+    uni, bi = {}, {}
+    t0 = time.perf_counter()
+    _, g = astar_array(dem, start, goal, costs=costs, stats=uni)
+    t_uni = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    _, cost = astar_bidirectional(dem, start, goal, costs=costs, stats=bi)
+    t_bi = time.perf_counter() - t0
+    exact = g[goal[0] * dem.shape[1] + goal[1]]
+    assert np.isclose(cost, exact), "bidirectional join is not optimal"
+    print(f"astar_array          {t_uni:8.2f} s  expanded {uni['expanded']:8d}  cost {exact:.2f} s")
+    print(f"astar_bidirectional  {t_bi:8.2f} s  expanded {bi['expanded']:8d}  cost {cost:.2f} s "
+          f"({bi['expanded_forward']} forward, {bi['expanded_backward']} backward)")
+    print(f"explored {bi['expanded'] / uni['expanded'] * 100:.0f}% of the unidirectional area")
+
+
+def report_battery(name, found, cost, used, elapsed, stats, time_limit):
+    if stats.get("truncated") and found is None:
+        print(f"{name:13s} {elapsed:8.2f} s  gave up after {time_limit:g} s before any feasible route")
+    elif stats.get("truncated"):
+        print(f"{name:13s} {elapsed:8.2f} s  stopped after {time_limit:g} s ({stats['labels']} labels), "
+              f"best so far: cost {cost:.2f} s  energy {used:.1f} Wh")
+    elif found is None:
+        print(f"{name:13s} {elapsed:8.2f} s  no feasible route")
+    elif stats.get("unconstrained"):
+        print(f"{name:13s} {elapsed:8.2f} s  cost {cost:.2f} s  energy {used:.1f} Wh  (fastest route fits)")
+    else:
+        print(f"{name:13s} {elapsed:8.2f} s  cost {cost:.2f} s  energy {used:.1f} Wh  "
+              f"({stats['labels']} labels, {stats['pruned']} pruned by the battery bound)")
+
+
+def bench_battery(dem, start, goal, fraction=0.9, pack=None, time_limit=2.0):
+    # Post-hoc check (fastest route, then its energy) against the battery-constrained search, with a budget of
+    # `fraction` of what the fastest route needs. Then the budget plan_for_drone really uses, battery_budget() of a
+    # fully charged drone: `pack` Wh, by default energy_util.pack_wh(), BATTERY_MAH at BATTERY_VOLTAGE.
+    costs = get_edge_costs(dem, wind_vector)
+    t0 = time.perf_counter()
+    pred, g = astar_array(dem, start, goal, costs=costs)
+    path = reconstruct_path_array(pred, start, goal, dem.shape)
+    energy = route_energy(route_segments(dem, path, wind_vector))
+    t_post = time.perf_counter() - t0
+    budget = energy * fraction
+    stats = {}
+    t0 = time.perf_counter()
+    found, cost, used = astar_battery(dem, start, goal, budget, wind_vector, costs=costs, time_limit=time_limit,
+                                      stats=stats)
+    t_rc = time.perf_counter() - t0
+    fastest = g[goal[0] * dem.shape[1] + goal[1]]
+    print(f"budget {budget:.1f} Wh ({fraction * 100:.0f}% of the fastest route's {energy:.1f} Wh)")
+    print(f"post-hoc      {t_post:8.2f} s  cost {fastest:.2f} s  {'feasible' if energy <= budget else 'REJECTED'}")
+    report_battery("constrained", found, cost, used, t_rc, stats, time_limit)
+    budget = battery_budget({"battery": 100}, pack)
+    source = f"{BATTERY_MAH} mAh at {BATTERY_VOLTAGE} V" if pack is None else "--pack"
+    print(f"full pack {budget:.1f} Wh ({source}): the fastest route needs {energy / budget:.1f}x that")
+    stats = {}
+    t0 = time.perf_counter()
+    found, cost, used = astar_battery(dem, start, goal, budget, wind_vector, costs=costs, time_limit=time_limit,
+                                      stats=stats)
+    report_battery("full pack", found, cost, used, time.perf_counter() - t0, stats, time_limit)
+
+
+def bench_replan(dem, start, goal, zone=12, gust=(6.0, 6.0)):
+    # Incremental replanning against a from-scratch astar_array after each change, which must agree on cost:
+    # the drone flies a quarter of the route, a square no-fly zone appears on the route ahead, then a gust
+    # changes the wind around the drone
+    t0 = time.perf_counter()
+    planner = DStarLite(dem, start, goal, wind_vector)
+    path, cost = planner.replan()
+    t_initial = time.perf_counter() - t0
+    print(f"initial plan     {t_initial:8.2f} s  expanded {planner.expanded:8d}  cost {cost:.2f} s")
+    here = path[len(path) // 4]
+    planner.move_to(here)
+    ahead = path[len(path) // 2]
+    polygon = [(ahead[0] - zone, ahead[1] - zone), (ahead[0] - zone, ahead[1] + zone),
+               (ahead[0] + zone, ahead[1] + zone), (ahead[0] + zone, ahead[1] - zone)]
+    wind = np.zeros(dem.shape + (2,)) + wind_vector
+    window = (max(here[0] - 30, 0), max(here[1] - 30, 0), here[0] + 30, here[1] + 30)
+    gusty = wind.copy()
+    gusty[window[0]:window[2], window[1]:window[3]] = gust
+    changes = [("no-fly zone", lambda: planner.add_no_fly("zone", polygon)),
+               ("local gust", lambda: planner.set_wind(gusty, window))]
+    for name, change in changes:
+        stats = {}
+        t0 = time.perf_counter()
+        change()
+        _, cost = planner.replan(stats)
+        t_inc = time.perf_counter() - t0
+        allowed = np.ones(dem.shape, dtype=bool)
+        for mask, (row0, col0) in planner.zones.values():
+            allowed[row0:row0 + mask.shape[0], col0:col0 + mask.shape[1]] &= ~mask
+        t0 = time.perf_counter()
+        scratch = {}
+        costs = mask_costs(edge_costs(dem, planner.wind), allowed)
+        _, g = astar_array(dem, here, goal, costs=costs, stats=scratch)
+        t_scratch = time.perf_counter() - t0
+        exact = g[goal[0] * dem.shape[1] + goal[1]]
+        assert np.isclose(cost, exact), f"replanned cost {cost} differs from astar {exact}"
+        print(f"{name:12s} replan {t_inc:8.2f} s  expanded {stats['expanded']:8d} | "
+              f"from scratch {t_scratch:8.2f} s  expanded {scratch['expanded']:8d}  cost {cost:.2f} s")
+
+
+def bench_any_angle(dem, start, goal):
+    # Grid route against its line-of-sight simplification: waypoints, flight time and routes.json geometry size
+    import json
+    from planner import route_record
+    pred, _ = astar_array(dem, start, goal, costs=get_edge_costs(dem, wind_vector))
+    path = reconstruct_path_array(pred, start, goal, dem.shape)
+    t0 = time.perf_counter()
+    waypoints, flight = simplify_path(dem, path, wind_vector)
+    elapsed = time.perf_counter() - t0
+    size = [len(json.dumps(route_record(p, {"id": "S"}, 0, 0, 0)["geometry"])) for p in (path, waypoints)]
+    print(f"grid route   {len(path):6d} waypoints  {path_time(dem, path, wind_vector):9.2f} s  {size[0]:7d} bytes")
+    print(f"any-angle    {len(waypoints):6d} waypoints  {flight:9.2f} s  {size[1]:7d} bytes  ({elapsed * 1000:.0f} ms)")
+
+
+def beacon_stream(n, beacons=200, seed=0):
+    # Message lines as the backend would relay them: presses repeated every 5 s, 2% corrupted check bytes, 1% of
+    # beacons without a GPS fix
+    rng = np.random.default_rng(seed)
+    ids = rng.integers(0, beacons, n)
+    times = np.sort(rng.uniform(0, n / 100, n))
+    lat, lon = rng.uniform(46.2, 46.5, beacons), rng.uniform(13.5, 14.1, beacons)
+    lat[:beacons // 100], lon[:beacons // 100] = 41.6478, 20.7506
+    payloads = [encode_payload(lat[b], lon[b]) for b in range(beacons)]
+    lines = []
+    for t, b, corrupt in zip(times, ids, rng.random(n) < 0.02):
+        payload = payloads[b][:-2] + "00" if corrupt else payloads[b]
+        lines.append(f"{t:.3f} B{b:04d} {payload}".encode())
+    return lines
+
+
+def bench_beacon(n):
+    # Decode throughput, ingest throughput (decode + de-duplication) and the same over the TCP stand-in
+    import socket
+    lines = beacon_stream(n)
+    payloads = [line.split()[2] for line in lines]
+    t0 = time.perf_counter()
+    lat, _, status = decode_payloads(payloads)
+    t_decode = time.perf_counter() - t0
+    reference = [float(bytes.fromhex(p.decode())[:11].rstrip(b"\0")) for p in payloads[:1000]]
+    assert np.allclose(lat[:1000][status[:1000] == 0], np.array(reference)[status[:1000] == 0])
+    ingest = BeaconIngest()
+    t0 = time.perf_counter()
+    for i in range(0, n, 4096):
+        ingest.ingest_lines(lines[i:i + 4096])
+    t_ingest = time.perf_counter() - t0
+    stats = ingest.stats()
+    assert stats["received"] == n
+    print(f"decode  {n / t_decode:12.0f} msg/s")
+    print(f"ingest  {n / t_ingest:12.0f} msg/s  " + "  ".join(f"{k} {stats[k]}" for k in STATUS_NAMES if stats[k]))
+    remote = BeaconIngest()
+    server = serve(remote, port=0)
+    t0 = time.perf_counter()
+    with socket.create_connection(server.server_address) as conn:
+        conn.sendall(b"\n".join(lines) + b"\n")
+    while remote.stats()["received"] < n:
+        time.sleep(0.001)
+    t_socket = time.perf_counter() - t0
+    server.shutdown()
+    assert remote.stats() == stats
+    print(f"socket  {n / t_socket:12.0f} msg/s")
+
+
+def bench_landing(dem, n=10000, radius=8, seed=0):
+    # One-time landability index against the ad-hoc alternative, a GeoGrid.snap search over the suitable mask for
+    # every alert; both must find drop cells at the same distance
+    from geo_util import GeoGrid
+    t0 = time.perf_counter()
+    index = build_index(dem)
+    t_build = time.perf_counter() - t0
+    landing = LandingIndex(index)
+    suitable = index["distance"] == 0
+    rng = np.random.default_rng(seed)
+    rows, cols = rng.integers(0, dem.shape[0], n), rng.integers(0, dem.shape[1], n)
+    t0 = time.perf_counter()
+    found = [landing.safe_cell((r, c), radius) for r, c in zip(rows.tolist(), cols.tolist())]
+    t_lookup = time.perf_counter() - t0
+    grid = GeoGrid.legacy(dem.shape)
+    lat, lon = grid.to_latlon(rows, cols, center=True)
+    reachable = index["distance"][rows, cols] <= radius
+    t0 = time.perf_counter()
+    snap_r, snap_c = grid.snap(lat[reachable], lon[reachable], suitable, radius)
+    t_search = time.perf_counter() - t0
+    mine = np.array([cell for cell in found if cell is not None])
+    assert np.allclose(np.hypot(mine[:, 0] - rows[reachable], mine[:, 1] - cols[reachable]),
+                       np.hypot(snap_r - rows[reachable], snap_c - cols[reachable])), "index and search disagree"
+    print(f"index build (once)  {t_build:8.2f} s  {suitable.mean() * 100:.1f}% of cells suitable, "
+          f"{index.nbytes / 2**20:.0f} MiB")
+    print(f"index lookup        {t_lookup / n * 1e6:8.2f} us/alert  {reachable.mean() * 100:.0f}% with a drop cell "
+          f"within {radius} cells")
+    print(f"neighbourhood search {t_search / reachable.sum() * 1e6:7.2f} us/alert (batched)")
+
+
+ENGINES = ("field", "astar_array", "astar_bidirectional")
+
+
+def run_case(case):
+    # One suite case, meant for a fresh process so peak RSS is its own: build a Planner over the case's DEM, replay
+    # the incident stream through it and summarize latency, search effort and cache use
+    import resource
+    import tempfile
+    from planner import Planner, route_record
+    from replay_util import load_json, scaled_stations, incident_stream, load_replay, replay, summarize
+    if case["dem"]:
+        from path_util import load_dem
+        dem, _ = load_dem(case["dem"])
+    else:
+        dem = synthetic_dem(*case["shape"], seed=case["seed"])
+    from geo_util import GeoGrid
+    stations = load_json("stations.json")
+    if not case["dem"]:
+        # In-memory DEMs use the legacy bounds, stations are moved to the same relative place on the smaller grid
+        stations = scaled_stations(stations, GeoGrid.legacy(dem.shape))
+    t0 = time.perf_counter()
+    planner = Planner(case["dem"] or dem, stations=stations, workers=case["workers"], cache_dir=tempfile.mkdtemp())
+    startup = time.perf_counter() - t0
+    skipped = 0
+    if case["replay"]:
+        stream, skipped = load_replay(case["replay"], planner.grid)
+    else:
+        centers = [(s["lat"], s["lon"]) for s in stations]
+        stream = incident_stream(planner.grid, centers, case["incidents"], spread=case["spread"], seed=case["seed"])
+    expanded = []
+    if case["engine"] == "field":
+        submit = planner.submit
+    else:
+        search = astar_array if case["engine"] == "astar_array" else astar_bidirectional
+        costs = get_edge_costs(planner.dem, planner.wind(*planner.grid.to_latlon(*planner.cells[0])))
+        cells = np.array(planner.cells)
+
+        def plan(incident):
+            goal = planner.goal_cell(incident["lat"], incident["lon"])
+            index = int(np.argmin(((cells - goal) ** 2).sum(axis=1)))
+            stats = {}
+            result = search(planner.dem, planner.cells[index], goal, costs=costs, stats=stats)
+            expanded.append(stats["expanded"])
+            if case["engine"] == "astar_array":
+                came_from, cost_so_far = result
+                path = reconstruct_path_array(came_from, planner.cells[index], goal, planner.dem.shape)
+                cost = cost_so_far[goal[0] * planner.dem.shape[1] + goal[1]]
+            else:
+                path, cost = result
+            return route_record(path, planner.stations[index], incident["lat"], incident["lon"], cost, grid=planner.grid)
+
+        def submit(incident):
+            return planner.pool.submit(plan, incident)
+    t0 = time.perf_counter()
+    results = replay(stream, submit, case["speedup"])
+    elapsed = time.perf_counter() - t0
+    planner.close()
+    latencies = [latency * 1000 for latency, route, _ in results if route is not None]
+    return dict(case, alerts=len(stream), skipped=skipped, failed=sum(1 for *_, error in results if error),
+                startup_s=startup, replay_s=elapsed, alerts_per_s=len(stream) / elapsed if elapsed else 0.0,
+                latency_ms=summarize(latencies), expanded=summarize(expanded),
+                route_cache=planner.route_cache.stats() if case["engine"] == "field" else None,
+                peak_rss_mb=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024)
+
+
+def bench_suite(shapes, engines, incidents=50, speedup=600.0, dem=None, replay_path=None, workers=4, seed=0,
+                output=None, baseline=None, tolerance=0.2):
+    # Every (DEM, engine) case in its own spawned process, results written as JSON and optionally checked against
+    # an earlier results file; returns the regressions found
+    import json
+    import multiprocessing
+    import platform
+    from concurrent.futures import ProcessPoolExecutor
+    from replay_util import compare
+    sources = [(f"synthetic-{h}x{w}", None, (h, w)) for h, w in shapes] + ([(os.path.basename(dem), dem, None)]
+                                                                            if dem else [])
+    cases = [{"name": f"{label}/{engine}", "dem": path, "shape": shape, "engine": engine, "incidents": incidents,
+              "speedup": speedup, "replay": replay_path, "workers": workers, "seed": seed, "spread": 40}
+             for label, path, shape in sources for engine in engines]
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    results = {"commit": commit, "python": platform.python_version(), "machine": platform.machine(),
+               "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()), "cases": []}
+    context = multiprocessing.get_context("spawn")
+    for case in cases:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            result = pool.submit(run_case, case).result()
+        results["cases"].append(result)
+        lat = result["latency_ms"]
+        cache = result["route_cache"]
+        print(f"{result['name']:40s} {result['alerts']:4d} alerts  p50 {lat.get('p50', 0):8.1f} ms  "
+              f"p99 {lat.get('p99', 0):8.1f} ms  expanded {result['expanded'].get('mean', 0):9.0f}  "
+              f"rss {result['peak_rss_mb']:6.0f} MiB" + (f"  cache hits {cache['hit_rate']:.0%}" if cache else "")
+              + (f"  ({result['skipped']} outside the DEM)" if result["skipped"] else ""))
+    if output:
+        with open(output, "w") as f:
+            json.dump(results, f, indent=2)
+    regressions = []
+    if baseline:
+        with open(baseline) as f:
+            regressions = compare(json.load(f), results, tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        print(f"{len(regressions)} regressions against {baseline}")
+    return regressions
+
+
+def bench_import(module="planner", budget=IMPORT_BUDGET):
+    # Fresh interpreter each time so nothing is already imported
+    code = ("import sys, time; t = time.perf_counter(); import {0}; t = time.perf_counter() - t; "
+            "heavy = [m for m in ('matplotlib', 'rasterio', 'dotenv', 'requests', 'flask') if m in sys.modules]; "
+            "print(t, ','.join(heavy))").format(module)
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                         cwd=os.path.dirname(os.path.abspath(__file__))).stdout.split()
+    elapsed, heavy = float(out[0]), out[1:] and out[1]
+    print(f"import {module}: {elapsed * 1000:.0f} ms (budget {budget * 1000:.0f} ms)"
+          f"{', pulls in ' + heavy if heavy else ''}")
+    assert elapsed <= budget, f"import {module} took {elapsed:.2f} s, over the {budget:.2f} s budget"
+    return elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare path_util.astar with the array-backed engine")
+    parser.add_argument("--dem", help="GeoTIFF to plan over (default: synthetic 779x2494 DEM)")
+    parser.add_argument("--start", type=int, nargs=2, default=(388, 669))  # Bovec
+    parser.add_argument("--goal", type=int, nargs=2, default=(292, 1348))  # Triglav
+    parser.add_argument("--dispatch", action="store_true", help="benchmark the multi-station dispatch field instead")
+    parser.add_argument("--hierarchical", action="store_true", help="benchmark coarse-to-fine planning instead")
+    parser.add_argument("--bidirectional", action="store_true", help="benchmark bidirectional search instead")
+    parser.add_argument("--battery", type=float, metavar="FRACTION",
+                        help="benchmark the battery-constrained search with this share of the fastest route's energy")
+    parser.add_argument("--pack", type=float, metavar="WH",
+                        help="full battery pack for --battery (default: energy_util.pack_wh(), about 98 Wh)")
+    parser.add_argument("--time-limit", type=float, default=2.0, help="search time limit for --battery, seconds")
+    parser.add_argument("--replan", action="store_true", help="benchmark incremental replanning instead")
+    parser.add_argument("--any-angle", action="store_true", help="benchmark line-of-sight waypoint compression")
+    parser.add_argument("--import-time", action="store_true", help="check the planner's cold import time budget")
+    parser.add_argument("--landing", action="store_true", help="benchmark the drop-point landability index")
+    parser.add_argument("--beacon", type=int, metavar="N", help="benchmark beacon message ingestion with N messages")
+    parser.add_argument("--suite", action="store_true",
+                        help="replay incident streams through the planner on several DEMs and engines")
+    parser.add_argument("--sizes", nargs="+", default=["256x512", "779x2494"], help="synthetic DEM sizes, HxW")
+    parser.add_argument("--engines", nargs="+", default=list(ENGINES), choices=ENGINES)
+    parser.add_argument("--incidents", type=int, default=50, help="synthetic incidents per case")
+    parser.add_argument("--speedup", type=float, default=600.0, help="replay this many times faster than real time, "
+                                                                     "0 for all at once")
+    parser.add_argument("--replay", help="replayEvents.json-style file to replay instead of synthetic incidents")
+    parser.add_argument("--output", help="write the suite results as JSON")
+    parser.add_argument("--compare", help="results JSON of an earlier run; exit 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="relative change counted as a regression")
+    args = parser.parse_args()
+    if args.import_time:
+        bench_import()
+        sys.exit()
+    if args.beacon:
+        bench_beacon(args.beacon)
+        sys.exit()
+    if args.suite:
+        shapes = [tuple(int(v) for v in size.split("x")) for size in args.sizes]
+        regressions = bench_suite(shapes, args.engines, args.incidents, args.speedup, args.dem, args.replay,
+                                  output=args.output, baseline=args.compare, tolerance=args.tolerance)
+        sys.exit(1 if regressions else 0)
+    if args.dem:
+        from path_util import load_dem
+        dem, _ = load_dem(args.dem)
+    else:
+        dem = synthetic_dem(779, 2494)
+    if args.dispatch:
+        bench_dispatch(dem, tuple(args.goal))
+    elif args.hierarchical:
+        bench_hierarchical(DEMManager(args.dem or dem), tuple(args.start), tuple(args.goal))
+    elif args.battery:
+        bench_battery(dem, tuple(args.start), tuple(args.goal), args.battery, args.pack, args.time_limit)
+    elif args.replan:
+        bench_replan(dem, tuple(args.start), tuple(args.goal))
+    elif args.landing:
+        bench_landing(dem)
+    elif args.any_angle:
+        bench_any_angle(dem, tuple(args.start), tuple(args.goal))
+    elif args.bidirectional:
+        bench_bidirectional(dem, tuple(args.start), tuple(args.goal))
+    else:
+        bench_astar(dem, tuple(args.start), tuple(args.goal))
@@ -0,0 +1,80 @@
+import threading
+from collections import OrderedDict
+import numpy as np
+from path_util import altitude_velocity, velocity, lpixel, travel_time
+from cost_util import wind_key
+
+ENTRY_OVERHEAD = 256  # bytes per entry besides the waypoints: key, summary, bookkeeping
+
+
+class RouteCache:
+    # LRU of planned routes keyed by (station, goal cell quantized to `radius` cells, DEM version, wind bucket).
+    # Entries keep the waypoints as an int16 array plus the time/energy summary and are evicted once their total
+    # size passes max_bytes.
+
+    def __init__(self, max_bytes=16 * 2**20, radius=4):
+        self.max_bytes = max_bytes
+        self.radius = radius
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = self.misses = self.evictions = 0
+
+    def key(self, station_id, goal, dem_version, wind_vector, wind_bucket=None):
+        # wind_bucket: wind_key(wind_vector) when the caller already has it
+        return (station_id, goal[0] // self.radius, goal[1] // self.radius, dem_version,
+                wind_bucket or wind_key(wind_vector))
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, waypoints, time, energy):
+        entry = {"waypoints": np.asarray(waypoints, dtype=np.int16), "time": float(time), "energy": float(energy)}
+        size = entry["waypoints"].nbytes + ENTRY_OVERHEAD
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old["waypoints"].nbytes + ENTRY_OVERHEAD
+            self._entries[key] = entry
+            self.bytes += size
+            while self.bytes > self.max_bytes and len(self._entries) > 1:
+                _, dropped = self._entries.popitem(last=False)
+                self.bytes -= dropped["waypoints"].nbytes + ENTRY_OVERHEAD
+                self.evictions += 1
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {"entries": len(self._entries), "bytes": self.bytes, "hits": self.hits, "misses": self.misses,
+                "evictions": self.evictions, "hit_rate": self.hits / total if total else 0.0}
+
+
+def extend_route(dem, path, goal, wind_vector=np.array([0, 0])):
+    # Straight 8-connected steps from the end of a cached path to a nearby goal, priced with the astar step rule.
+    # Returns (the new cells, their flight time).
+    r, c = (int(v) for v in path[-1])
+    cells, time = [], 0.0
+    while (r, c) != tuple(goal):
+        dr, dc = int(np.sign(goal[0] - r)), int(np.sign(goal[1] - c))
+        step_distance = np.linalg.norm([dr, dc])
+        max_alt_change = altitude_velocity * (step_distance / (velocity / lpixel))
+        alt_diff = dem[r + dr, c + dc] - dem[r, c]
+        if alt_diff > max_alt_change:
+            time += alt_diff / altitude_velocity
+        wind = wind_vector[r, c] if np.ndim(wind_vector) == 3 else wind_vector
+        time += travel_time(step_distance, np.array([dr, dc]), wind)
+        r, c = r + dr, c + dc
+        cells.append((r, c))
+    return cells, float(time)
@@ -0,0 +1,77 @@
+import hashlib
+import threading
+import numpy as np
+from path_util import altitude_velocity, velocity, lpixel, NEIGHBOURS
+
+WIND_BUCKET = 1.0  # m/s, wind resolution used for cached fields and routes
+
+_cost_cache = {}
+_cost_lock = threading.Lock()
+
+
+def dem_hash(dem):
+    return hashlib.sha1(np.ascontiguousarray(dem).view(np.uint8)).hexdigest()
+
+
+def quantize_wind(wind_vector, step=WIND_BUCKET):
+    # Snap a wind vector, or a per-cell (h, w, 2) wind raster, to bucket centres
+    return np.round(np.asarray(wind_vector, dtype=float) / step) * step
+
+
+def wind_key(wind_vector, step=WIND_BUCKET):
+    # Cache key of the wind bucket: "w<row>_<col>" for a constant wind, a hash for a raster
+    bucket = np.round(np.asarray(wind_vector, dtype=float) / step).astype(np.int64)
+    if bucket.ndim == 1:
+        return f"w{bucket[0]}_{bucket[1]}"
+    return "r" + hashlib.sha1(bucket.tobytes()).hexdigest()[:12]
+
+
+def edge_costs(dem, wind_vector=np.array([0, 0]), dtype=np.float64, pixel_size=lpixel):
+    # costs[k, r, c] is the astar step cost from (r, c) to (r, c) + NEIGHBOURS[k], inf where that leaves the grid.
+    # Evaluated with the same float32/float64 arithmetic as the scalar loop so searches stay bit-identical.
+    # pixel_size (m) other than lpixel prices a downsampled DEM. wind_vector may also be an (h, w, 2) raster, in
+    # which case each edge uses the wind of the cell it leaves.
+    wind = np.asarray(wind_vector)
+    h, w = dem.shape
+    costs = np.full((len(NEIGHBOURS), h, w), np.inf, dtype=dtype)
+    for k, (dr, dc) in enumerate(NEIGHBOURS):
+        src = (slice(max(0, -dr), h - max(0, dr)), slice(max(0, -dc), w - max(0, dc)))
+        dst = (slice(max(0, dr), h - max(0, -dr)), slice(max(0, dc), w - max(0, -dc)))
+        step_distance = np.linalg.norm([dr, dc])
+        max_alt_change = altitude_velocity * (step_distance / (velocity / pixel_size))
+        if wind.ndim == 3:
+            ws = wind[src]
+            speed = np.sqrt((dr * velocity + ws[..., 0]) ** 2 + (dc * velocity + ws[..., 1]) ** 2) / pixel_size
+            tt = step_distance / speed
+        else:
+            # path_util.travel_time with the pixel size as a parameter
+            tt = step_distance / (np.linalg.norm(np.array([dr, dc]) * velocity + wind) / pixel_size)
+        alt_diff = dem[dst] - dem[src]
+        climb = np.where(alt_diff > max_alt_change, alt_diff / altitude_velocity, 0)
+        costs[k][src] = climb.astype(np.float64) + tt
+    return costs
+
+
+def mask_costs(costs, mask):
+    # Forbid every edge that leaves or enters a cell where mask is False (corridors, no-fly zones)
+    _, h, w = costs.shape
+    for k, (dr, dc) in enumerate(NEIGHBOURS):
+        src = (slice(max(0, -dr), h - max(0, dr)), slice(max(0, -dc), w - max(0, dc)))
+        dst = (slice(max(0, dr), h - max(0, -dr)), slice(max(0, dc), w - max(0, -dc)))
+        blocked = ~mask
+        blocked[src] |= ~mask[dst]
+        costs[k][blocked] = np.inf
+    return costs
+
+
+def get_edge_costs(dem, wind_vector=np.array([0, 0])):
+    # Rasters depend only on the DEM and the wind, so they are shared by every station and every later alert
+    wind = np.asarray(wind_vector, dtype=float)
+    key = (dem_hash(dem), tuple(wind) if wind.ndim == 1 else hashlib.sha1(wind.tobytes()).hexdigest())
+    # One build at a time: threads asking for the raster being built wait for it rather than building a copy
+    with _cost_lock:
+        costs = _cost_cache.get(key)
+        if costs is None:
+            _cost_cache.clear()
+            costs = _cost_cache[key] = edge_costs(dem, wind_vector)
+    return costs
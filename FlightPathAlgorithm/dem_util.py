@@ -0,0 +1,139 @@
+import os
+from collections import OrderedDict
+import numpy as np
+from geo_util import GeoGrid
+
+
+class DEMManager:
+    # Opens the raster once and serves windowed reads from an LRU of fixed-size tiles, so an alert only
+    # touches the part of the DEM around the stations and the goal. Downsampled overviews are built once
+    # and kept next to the raster as memory-mapped .npy files.
+
+    def __init__(self, source, tile_size=256, max_tiles=64, overview_factors=(2, 4, 8)):
+        self.tile_size = tile_size
+        self.max_tiles = max_tiles
+        self.overview_factors = tuple(overview_factors)
+        self._tiles = OrderedDict()
+        self._overviews = {}
+        self.hits = self.misses = 0
+        if isinstance(source, np.ndarray):
+            # In-memory DEM (synthetic terrain, tests)
+            self.path = None
+            self._src = None
+            self._array = source
+            self.shape = source.shape
+            self.transform = None
+            self.nodata = None
+        else:
+            import rasterio
+            self.path = source
+            self._src = rasterio.open(source)
+            self._array = None
+            self.shape = (self._src.height, self._src.width)
+            self.transform = self._src.transform
+            self.nodata = self._src.nodata
+        # lat/lon <-> cell conversions follow the raster's own transform; in-memory DEMs keep path_util's bounds
+        self.grid = GeoGrid(self.transform, self.shape) if self.transform is not None else GeoGrid.legacy(self.shape)
+
+    def _read_tile(self, ti, tj):
+        r0, c0 = ti * self.tile_size, tj * self.tile_size
+        r1, c1 = min(r0 + self.tile_size, self.shape[0]), min(c0 + self.tile_size, self.shape[1])
+        if self._array is not None:
+            return np.array(self._array[r0:r1, c0:c1])
+        from rasterio.windows import Window
+        return self._src.read(1, window=Window(c0, r0, c1 - c0, r1 - r0))
+
+    def tile(self, ti, tj):
+        key = (ti, tj)
+        if key in self._tiles:
+            self.hits += 1
+            self._tiles.move_to_end(key)
+            return self._tiles[key]
+        self.misses += 1
+        data = self._read_tile(ti, tj)
+        self._tiles[key] = data
+        if len(self._tiles) > self.max_tiles:
+            self._tiles.popitem(last=False)
+        return data
+
+    def read_all(self):
+        # The whole raster in one read, past the tile cache so it does not end up held twice
+        if self._array is not None:
+            return np.array(self._array)
+        return self._src.read(1)
+
+    def read(self, row0, col0, row1, col1):
+        # Rows row0..row1-1 and cols col0..col1-1, assembled from cached tiles
+        row0, col0 = max(row0, 0), max(col0, 0)
+        row1, col1 = min(row1, self.shape[0]), min(col1, self.shape[1])
+        if row0 >= row1 or col0 >= col1:
+            raise ValueError(f"Empty DEM window ({row0}, {col0}, {row1}, {col1})")
+        if (row0, col0, row1, col1) == (0, 0) + tuple(self.shape):
+            return self.read_all()
+        ts = self.tile_size
+        out = None
+        for ti in range(row0 // ts, (row1 - 1) // ts + 1):
+            for tj in range(col0 // ts, (col1 - 1) // ts + 1):
+                data = self.tile(ti, tj)
+                if out is None:
+                    out = np.empty((row1 - row0, col1 - col0), dtype=data.dtype)
+                tr0, tc0 = ti * ts, tj * ts
+                r0, r1 = max(row0, tr0), min(row1, tr0 + data.shape[0])
+                c0, c1 = max(col0, tc0), min(col1, tc0 + data.shape[1])
+                out[r0 - row0:r1 - row0, c0 - col0:c1 - col0] = data[r0 - tr0:r1 - tr0, c0 - tc0:c1 - tc0]
+        return out
+
+    def window_for(self, cells, margin=64):
+        # Bounding box of the given (row, col) cells plus a margin, clipped to the raster
+        cells = np.asarray(cells)
+        row0, col0 = cells.min(axis=0) - margin
+        row1, col1 = cells.max(axis=0) + margin + 1
+        return (max(int(row0), 0), max(int(col0), 0),
+                min(int(row1), self.shape[0]), min(int(col1), self.shape[1]))
+
+    def read_around(self, cells, margin=64):
+        # DEM window covering the cells, plus the (row, col) offset of its top-left corner
+        row0, col0, row1, col1 = self.window_for(cells, margin)
+        return self.read(row0, col0, row1, col1), (row0, col0)
+
+    def _overview_path(self, factor):
+        return f"{self.path}.ovr{factor}.npy" if self.path else None
+
+    def _build_overview(self, factor):
+        h, w = self.shape[0] // factor, self.shape[1] // factor
+        if self._array is not None:
+            block = self._array[:h * factor, :w * factor].reshape(h, factor, w, factor)
+            return block.mean(axis=(1, 3)).astype(self._array.dtype)
+        from rasterio.enums import Resampling
+        from rasterio.windows import Window
+        # Same block alignment as the in-memory path; uses the GeoTIFF's internal overviews when it has them
+        return self._src.read(1, window=Window(0, 0, w * factor, h * factor), out_shape=(h, w),
+                              resampling=Resampling.average)
+
+    def overview(self, factor):
+        # DEM downsampled by an integer factor, one pixel per factor x factor block
+        if factor == 1:
+            return self.read_all()
+        if factor in self._overviews:
+            return self._overviews[factor]
+        path = self._overview_path(factor)
+        if path and os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(self.path):
+            data = np.load(path, mmap_mode="r")
+        else:
+            data = self._build_overview(factor)
+            if path:
+                np.save(path, data)
+                data = np.load(path, mmap_mode="r")
+        self._overviews[factor] = data
+        return data
+
+    def build_overviews(self):
+        for factor in self.overview_factors:
+            self.overview(factor)
+        return self._overviews
+
+    def close(self):
+        self._tiles.clear()
+        if self._src is not None:
+            self._src.close()
+            self._src = None
@@ -0,0 +1,192 @@
+import json
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+from geo_util import GeoGrid
+from cost_util import get_edge_costs
+from energy_util import route_segments_many, route_energy
+from field_util import multi_source_dijkstra, route_from_field
+from planner import load_stations, route_record
+
+AVAILABLE = ("idle", "charging")
+
+_shared = {}
+
+
+def load_inventory(drones_path, stations_path):
+    # Drone and station lists in the dashboard's drones.json / stations.json shape
+    with open(drones_path) as f:
+        drones = json.load(f)
+    return drones, load_stations(stations_path)
+
+
+def _attach(name, shape, dtype):
+    # Worker initializer: map the parent's edge-cost rasters instead of copying them
+    shm = shared_memory.SharedMemory(name=name)
+    _shared["shm"] = shm
+    _shared["costs"] = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+
+def _station_routes(station_cell, incident_cells):
+    # Single-source Dijkstra from one station, stopped once every incident is settled
+    field = multi_source_dijkstra(_shared["costs"], [station_cell], targets=incident_cells)
+    times, paths = [], []
+    for cell in incident_cells:
+        _, path, cost = route_from_field(field, cell)
+        times.append(cost)
+        paths.append(path)
+    return times, paths
+
+
+def _ready():
+    return os.getpid()
+
+
+class StationRouter:
+    # The worker processes and the shared-memory block of station_incident_routes, kept for the life of a service.
+    # The block holds the edge-cost rasters of the last wind dispatched for; another wind is copied over them in
+    # place, so the workers stay attached. Dispatches take turns, each one already uses every worker.
+
+    def __init__(self, shape, dtype=np.float64, workers=None):
+        dtype = np.dtype(dtype)
+        self.shm = shared_memory.SharedMemory(create=True, size=int(np.prod(shape)) * dtype.itemsize)
+        self.costs = np.ndarray(shape, dtype=dtype, buffer=self.shm.buf)
+        self.workers = workers or os.cpu_count()
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_attach,
+                                        initargs=(self.shm.name, shape, dtype.str))
+        self._lock = threading.Lock()
+        self._loaded = None
+        # Start the workers now rather than forking from a request thread later
+        for future in [self.pool.submit(_ready) for _ in range(self.workers)]:
+            future.result()
+
+    def routes(self, costs, station_cells, incident_cells):
+        with self._lock:
+            if self._loaded is not costs:
+                self.costs[:] = costs
+                self._loaded = costs  # rasters are cached and never written, so identity means same contents
+            results = list(self.pool.map(_station_routes, station_cells, [incident_cells] * len(station_cells)))
+        times = np.array([t for t, _ in results]).reshape(len(station_cells), len(incident_cells))
+        return times, [p for _, p in results]
+
+    def close(self):
+        self.pool.shutdown(wait=True)
+        self.shm.close()
+        self.shm.unlink()
+
+
+def station_incident_routes(costs, station_cells, incident_cells, workers=None, router=None):
+    # Times (stations x incidents) and routes from every station to every incident, one station per process.
+    # The rasters live in shared memory, so workers read the same pages instead of a pickled copy each. Without
+    # a router the pool and the block last for this call only.
+    if router is not None:
+        return router.routes(costs, station_cells, incident_cells)
+    router = StationRouter(costs.shape, costs.dtype, workers)
+    try:
+        return router.routes(costs, station_cells, incident_cells)
+    finally:
+        router.close()
+
+
+def assign(cost):
+    # Minimum-total-cost assignment (Hungarian algorithm). Returns the column matched to each row, or -1 when
+    # the row stays unmatched (more rows than columns, or only infeasible inf entries left).
+    cost = np.asarray(cost, dtype=float)
+    n, m = cost.shape
+    if n == 0 or m == 0:
+        return [-1] * n
+    if n > m:
+        cols = assign(cost.T)
+        rows = [-1] * n
+        for j, i in enumerate(cols):
+            if i >= 0:
+                rows[i] = j
+        return rows
+    finite = np.isfinite(cost)
+    big = (np.abs(cost[finite]).sum() + 1) * (n + 1) if finite.any() else 1.0
+    a = np.where(finite, cost, big)
+    u, v = [0.0] * (n + 1), [0.0] * (m + 1)
+    p, way = [0] * (m + 1), [0] * (m + 1)
+    for i in range(1, n + 1):
+        p[0] = i
+        j0 = 0
+        minv = [np.inf] * (m + 1)
+        used = [False] * (m + 1)
+        while True:
+            used[j0] = True
+            i0, delta, j1 = p[j0], np.inf, 0
+            for j in range(1, m + 1):
+                if not used[j]:
+                    cur = a[i0 - 1, j - 1] - u[i0] - v[j]
+                    if cur < minv[j]:
+                        minv[j], way[j] = cur, j0
+                    if minv[j] < delta:
+                        delta, j1 = minv[j], j
+            for j in range(m + 1):
+                if used[j]:
+                    u[p[j]] += delta
+                    v[j] -= delta
+                else:
+                    minv[j] -= delta
+            j0 = j1
+            if p[j0] == 0:
+                break
+        while j0:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+    rows = [-1] * n
+    for j in range(1, m + 1):
+        if p[j] and finite[p[j] - 1, j - 1]:
+            rows[p[j] - 1] = j - 1
+    return rows
+
+
+def batch_dispatch(dem, incidents, drones, stations, wind_vector=np.array([0, 0]), workers=None, pack_wh=None,
+                   min_battery=20, mass=24.0, grid=None, costs=None, router=None):
+    # incidents: [(lat, lon), ...]. Every available drone is matched to at most one incident so that the total
+    # flight time is minimal; with pack_wh, drones whose battery share cannot cover the route are excluded.
+    # A long-running caller passes its cached edge costs for wind_vector and a StationRouter.
+    grid = grid or GeoGrid.legacy(dem.shape)
+    points = np.asarray(incidents, dtype=float).reshape(-1, 2)
+    rows, cols = grid.to_cells(points[:, 0], points[:, 1])
+    incident_cells = [(int(r), int(c)) for r, c in zip(rows, cols)]
+    by_id = {s["id"]: i for i, s in enumerate(stations) if s.get("status") != "offline"}
+    fleet = [d for d in drones
+             if d.get("status") in AVAILABLE and d.get("battery", 0) >= min_battery and d.get("station") in by_id]
+    used_stations = sorted({by_id[d["station"]] for d in fleet})
+    if not fleet or not incident_cells:
+        return {"assignments": [], "unassigned": list(range(len(incident_cells)))}
+
+    costs = get_edge_costs(dem, wind_vector) if costs is None else costs
+    times, paths = station_incident_routes(costs, [tuple(stations[i]["cell"]) for i in used_stations],
+                                           incident_cells, workers, router)
+    row_of = {s: k for k, s in enumerate(used_stations)}
+    energy = np.full(times.shape, np.inf)
+    found = [(k, j) for k in range(len(used_stations)) for j, path in enumerate(paths[k]) if path is not None]
+    segments = route_segments_many(dem, [paths[k][j] for k, j in found], wind_vector, mass)
+    for (k, j), route in zip(found, segments):
+        energy[k, j] = route_energy(route)
+
+    matrix = np.empty((len(fleet), len(incident_cells)))
+    for i, drone in enumerate(fleet):
+        k = row_of[by_id[drone["station"]]]
+        matrix[i] = times[k]
+        if pack_wh is not None:
+            matrix[i, energy[k] > drone["battery"] / 100 * pack_wh] = np.inf
+
+    assignments, taken = [], set()
+    for i, j in enumerate(assign(matrix)):
+        if j < 0:
+            continue
+        drone = fleet[i]
+        k = row_of[by_id[drone["station"]]]
+        lat, lon = incidents[j]
+        assignments.append(route_record(paths[k][j], stations[by_id[drone["station"]]], lat, lon, times[k, j],
+                                        drone_id=drone["id"], grid=grid, incident=j,
+                                        energy=round(float(energy[k, j]), 2)))
+        taken.add(j)
+    assignments.sort(key=lambda r: r["incident"])
+    return {"assignments": assignments, "unassigned": [j for j in range(len(incident_cells)) if j not in taken]}
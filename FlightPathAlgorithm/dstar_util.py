@@ -0,0 +1,221 @@
+import heapq
+import numpy as np
+from path_util import NEIGHBOURS, heuristic_vertices, time_lower_bound
+from cost_util import edge_costs
+
+
+def polygon_mask(shape, polygon):
+    # Cells whose centre lies inside a polygon of (row, col) vertices (even-odd rule), over the polygon's bounding
+    # box clipped to the grid. Returns (mask, (row0, col0)).
+    poly = np.asarray(polygon, dtype=float)
+    row0, col0 = max(int(np.floor(poly[:, 0].min())), 0), max(int(np.floor(poly[:, 1].min())), 0)
+    row1 = min(int(np.ceil(poly[:, 0].max())) + 1, shape[0])
+    col1 = min(int(np.ceil(poly[:, 1].max())) + 1, shape[1])
+    rows, cols = np.mgrid[row0:max(row1, row0), col0:max(col1, col0)]
+    inside = np.zeros(rows.shape, dtype=bool)
+    for (r1, c1), (r2, c2) in zip(poly, np.roll(poly, -1, axis=0)):
+        crosses = (r1 > rows) != (r2 > rows)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            at = c1 + (rows - r1) * (c2 - c1) / (r2 - r1)
+        inside ^= crosses & (cols < at)
+    return inside, (row0, col0)
+
+
+def dilate(mask):
+    # mask grown by one cell in all eight directions, on a one-cell padded canvas
+    grown = np.zeros((mask.shape[0] + 2, mask.shape[1] + 2), dtype=bool)
+    for dr in (-1, 0, 1):
+        for dc in (-1, 0, 1):
+            grown[1 + dr:1 + dr + mask.shape[0], 1 + dc:1 + dc + mask.shape[1]] |= mask
+    return grown
+
+
+class DStarLite:
+    # Incremental planner (D* Lite) over cost_util.edge_costs rasters. The search runs backwards from the goal, so
+    # g[s] is the flight time from s to the goal; after a local wind change or a new no-fly zone only the cells
+    # whose g became inconsistent are re-expanded, and the drone's current cell can move without a restart.
+
+    def __init__(self, dem, start, goal, wind_vector=np.array([0, 0]), costs=None):
+        self.dem = dem
+        self.shape = h, w = dem.shape
+        self.wind = np.asarray(wind_vector, dtype=float)
+        # Own copy, the rasters are edited in place as conditions change
+        self.costs = (edge_costs(dem, wind_vector) if costs is None else np.array(costs)).reshape(len(NEIGHBOURS), h * w)
+        self.blocked = np.zeros(h * w, dtype=np.int16)  # number of no-fly zones covering each cell
+        self.zones = {}
+        self.offsets = [dr * w + dc for dr, dc in NEIGHBOURS]
+        self.min_costs = self.costs.min(axis=1)
+        self.vertices = heuristic_vertices(self.min_costs)
+        self.g = np.full(h * w, np.inf)
+        self.rhs = np.full(h * w, np.inf)
+        self.start = self.last = start[0] * w + start[1]
+        self.goal = goal[0] * w + goal[1]
+        self.km = 0.0
+        self.queue = []
+        self.queued = {}
+        self.expanded = 0
+        self.rhs[self.goal] = 0
+        self._update_vertex(self.goal)
+
+    def _h(self, cell):
+        # Lower bound on the time from the drone's cell to `cell`
+        sr, sc = divmod(self.start, self.shape[1])
+        r, c = divmod(cell, self.shape[1])
+        return time_lower_bound(self.vertices, r - sr, c - sc)
+
+    def _key(self, cell):
+        best = min(self.g[cell], self.rhs[cell])
+        return best + self._h(cell) + self.km, best
+
+    def _cost(self, u, k):
+        c = self.costs[k][u]
+        if c == np.inf or self.blocked[u] or self.blocked[u + self.offsets[k]]:
+            return np.inf
+        return c
+
+    def _successor_min(self, u):
+        best = np.inf
+        for k, off in enumerate(self.offsets):
+            c = self._cost(u, k)
+            if c < np.inf and c + self.g[u + off] < best:
+                best = c + self.g[u + off]
+        return best
+
+    def _predecessors(self, v):
+        # (u, k) for every u with an edge u -> v in direction k
+        h, w = self.shape
+        r, c = divmod(v, w)
+        for k, (dr, dc) in enumerate(NEIGHBOURS):
+            if 0 <= r - dr < h and 0 <= c - dc < w:
+                yield v - self.offsets[k], k
+
+    def _update_vertex(self, u):
+        if self.g[u] != self.rhs[u]:
+            key = self._key(u)
+            self.queued[u] = key
+            heapq.heappush(self.queue, (key, u))
+        else:
+            self.queued.pop(u, None)
+
+    def _touch(self, cells):
+        # Recompute rhs of cells whose outgoing edges changed
+        for u in cells:
+            u = int(u)
+            if u != self.goal:
+                self.rhs[u] = self._successor_min(u)
+            self._update_vertex(u)
+
+    def compute(self):
+        expanded = 0
+        while self.queue:
+            key, u = self.queue[0]
+            if self.queued.get(u) != key:
+                heapq.heappop(self.queue)
+                continue
+            if key >= self._key(self.start) and self.rhs[self.start] == self.g[self.start]:
+                break
+            heapq.heappop(self.queue)
+            new_key = self._key(u)
+            if key < new_key:
+                self.queued[u] = new_key
+                heapq.heappush(self.queue, (new_key, u))
+                continue
+            del self.queued[u]
+            expanded += 1
+            if self.g[u] > self.rhs[u]:
+                self.g[u] = self.rhs[u]
+                for p, k in self._predecessors(u):
+                    if p != self.goal:
+                        self.rhs[p] = min(self.rhs[p], self._cost(p, k) + self.g[u])
+                    self._update_vertex(p)
+            else:
+                g_old = self.g[u]
+                self.g[u] = np.inf
+                for p, k in list(self._predecessors(u)) + [(u, None)]:
+                    if p != self.goal and (k is None or self.rhs[p] == self._cost(p, k) + g_old):
+                        self.rhs[p] = self._successor_min(p)
+                    self._update_vertex(p)
+        self.expanded += expanded
+        return expanded
+
+    def move_to(self, cell):
+        # The drone has flown on to `cell`
+        cell = cell[0] * self.shape[1] + cell[1]
+        lr, lc = divmod(self.last, self.shape[1])
+        r, c = divmod(cell, self.shape[1])
+        self.km += time_lower_bound(self.vertices, r - lr, c - lc)
+        self.start = self.last = cell
+
+    def _rekey(self):
+        # Cheaper edges than the heuristic was built for: rebuild it and every queue key from the current cell
+        self.vertices = heuristic_vertices(self.min_costs)
+        self.km = 0.0
+        self.last = self.start
+        self.queued = {u: self._key(u) for u in self.queued}
+        self.queue = [(key, u) for u, key in self.queued.items()]
+        heapq.heapify(self.queue)
+
+    def set_wind(self, wind_vector, window=None):
+        # New wind (vector or (h, w, 2) raster) that differs from the old one only inside window
+        # (row0, col0, row1, col1); edges leaving those cells are repriced
+        h, w = self.shape
+        self.wind = np.asarray(wind_vector, dtype=float)
+        row0, col0, row1, col1 = window or (0, 0, h, w)
+        r0, c0, r1, c1 = max(row0 - 1, 0), max(col0 - 1, 0), min(row1 + 1, h), min(col1 + 1, w)
+        wind = self.wind[r0:r1, c0:c1] if self.wind.ndim == 3 else self.wind
+        fresh = edge_costs(self.dem[r0:r1, c0:c1], wind)[:, row0 - r0:row1 - r0, col0 - c0:col1 - c0]
+        current = self.costs.reshape(len(NEIGHBOURS), h, w)[:, row0:row1, col0:col1]
+        changed = np.nonzero((fresh != current).any(axis=0))
+        current[:] = fresh
+        lower = np.minimum(self.min_costs, fresh.reshape(len(NEIGHBOURS), -1).min(axis=1))
+        if (lower < self.min_costs).any():
+            self.min_costs = lower
+            self._rekey()
+        self._touch((changed[0] + row0) * w + changed[1] + col0)
+
+    def _zone_cells(self, mask, origin, delta):
+        h, w = self.shape
+        row0, col0 = origin
+        rows, cols = np.nonzero(mask)
+        self.blocked[(rows + row0) * w + cols + col0] += delta
+        # Edges leave or enter the zone from its cells and their neighbours
+        rows, cols = np.nonzero(dilate(mask))
+        rows, cols = rows + row0 - 1, cols + col0 - 1
+        keep = (rows >= 0) & (rows < h) & (cols >= 0) & (cols < w)
+        self._touch(rows[keep] * w + cols[keep])
+
+    def add_no_fly(self, zone_id, polygon):
+        # polygon: (row, col) vertices
+        mask, origin = polygon_mask(self.shape, polygon)
+        self.zones[zone_id] = (mask, origin)
+        self._zone_cells(mask, origin, 1)
+
+    def clear_no_fly(self, zone_id):
+        mask, origin = self.zones.pop(zone_id)
+        self._zone_cells(mask, origin, -1)
+
+    @property
+    def cost(self):
+        return float(self.g[self.start])
+
+    def path(self):
+        # Greedy descent of g from the drone's cell; None when the goal is unreachable
+        if self.g[self.start] == np.inf:
+            return None
+        cells = [self.start]
+        while cells[-1] != self.goal:
+            u = cells[-1]
+            best, nxt = np.inf, -1
+            for k, off in enumerate(self.offsets):
+                c = self._cost(u, k)
+                if c < np.inf and c + self.g[u + off] < best:
+                    best, nxt = c + self.g[u + off], u + off
+            cells.append(nxt)
+        return [divmod(int(u), self.shape[1]) for u in cells]
+
+    def replan(self, stats=None):
+        # Bring g up to date after move_to / set_wind / no-fly changes; returns (path, cost)
+        expanded = self.compute()
+        if stats is not None:
+            stats.update(expanded=expanded)
+        return self.path(), self.cost
@@ -0,0 +1,105 @@
+import numpy as np
+from path_util import velocity, lpixel, NEIGHBOURS
+
+# The inventory's pack: 4416 mAh at 22.2 V (6S), about 98 Wh. step_energy draws ~2.8 kW for the 24 kg airframe,
+# which that pack sustains for about two minutes, so most routes over the full DEM do not fit a single pack.
+BATTERY_MAH = 4416
+BATTERY_VOLTAGE = 22.2  # 6S pack
+
+SEGMENT_DTYPE = np.dtype([
+    ("dx", "f4"),          # step length in pixels
+    ("climb", "f4"),       # elevation change in metres
+    ("time", "f8"),        # seconds
+    ("energy", "f8"),      # Wh
+    ("cum_time", "f8"),
+    ("cum_energy", "f8"),
+    ("draw", "f4"),        # cumulative share of the pack in %
+])
+
+
+def pack_wh(capacity_mah=BATTERY_MAH, voltage=BATTERY_VOLTAGE):
+    return capacity_mah / 1000 * voltage
+
+
+def battery_budget(drone, pack=None):
+    # Wh left in a drone from the inventory's battery percentage
+    pack = pack_wh() if pack is None else pack
+    return drone.get("battery", 0) / 100 * pack
+
+
+def step_energy(dx, climb, mass=24.0):
+    # energy_cost in Wh: moving power for the step duration, 30% more when the step gains height
+    p_move = 1.2 * 4400 * pow(mass / 36.9, 1.5)
+    return np.where(climb > 0, 1.3, 1.0) * p_move * dx / (velocity / lpixel) / 3600
+
+
+def energy_lower_bound(dr, dc, mass=24.0):
+    # Least energy to cover a displacement: octile distance flown level
+    a, b = abs(dr), abs(dc)
+    return float(step_energy(max(a, b) + (np.sqrt(2) - 1) * min(a, b), 0, mass))
+
+
+def edge_energies(dem, mass=24.0):
+    # energies[k, r, c] is the energy of the step from (r, c) to (r, c) + NEIGHBOURS[k], laid out like
+    # cost_util.edge_costs; inf where the step leaves the grid
+    h, w = dem.shape
+    energies = np.full((len(NEIGHBOURS), h, w), np.inf)
+    for k, (dr, dc) in enumerate(NEIGHBOURS):
+        src = (slice(max(0, -dr), h - max(0, dr)), slice(max(0, -dc), w - max(0, dc)))
+        dst = (slice(max(0, dr), h - max(0, -dr)), slice(max(0, dc), w - max(0, -dc)))
+        energies[k][src] = step_energy(np.hypot(dr, dc), dem[dst] - dem[src], mass)
+    return energies
+
+
+def _segments(path):
+    path = np.asarray(path, dtype=np.intp).reshape(-1, 2)
+    p1, p2 = path[:-1], path[1:]
+    return p1, p2 - p1
+
+
+def _evaluate(dem, p1, moves, wind_vector, mass):
+    # The same per-step arithmetic as energy_cost and travel_time, over every segment at once
+    dx = np.hypot(moves[:, 0], moves[:, 1])
+    climb = dem[p1[:, 0] + moves[:, 0], p1[:, 1] + moves[:, 1]] - dem[p1[:, 0], p1[:, 1]]
+    # A (h, w, 2) wind raster is sampled at the cell the segment leaves
+    wind = wind_vector[p1[:, 0], p1[:, 1]] if np.ndim(wind_vector) == 3 else np.asarray(wind_vector, dtype=float)
+    ground = moves * velocity + wind
+    time = dx / (np.hypot(ground[:, 0], ground[:, 1]) / lpixel)
+    return dx, climb, time, step_energy(dx, climb, mass)
+
+
+def route_segments_many(dem, paths, wind_vector=np.array([0, 0]), mass=24.0, pack=None):
+    # Per-segment record arrays (SEGMENT_DTYPE) for several paths, evaluated in one vectorized pass
+    pack = pack_wh() if pack is None else pack
+    parts = [_segments(path) for path in paths]
+    counts = np.array([len(p1) for p1, _ in parts])
+    if counts.sum() == 0:
+        return [np.zeros(0, dtype=SEGMENT_DTYPE) for _ in paths]
+    p1 = np.concatenate([p for p, _ in parts])
+    moves = np.concatenate([m for _, m in parts])
+    dx, climb, time, energy = _evaluate(dem, p1, moves, wind_vector, mass)
+
+    out = np.empty(len(dx), dtype=SEGMENT_DTYPE)
+    out["dx"], out["climb"], out["time"], out["energy"] = dx, climb, time, energy
+    # Cumulative sums restart at every path: subtract the running total reached before each path starts
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    for field, source in (("cum_time", time), ("cum_energy", energy)):
+        total = np.cumsum(source)
+        before = np.concatenate([[0.0], total])[starts]
+        out[field] = total - np.repeat(before, counts)
+    out["draw"] = out["cum_energy"] / pack * 100
+    return np.split(out, np.cumsum(counts)[:-1])
+
+
+def route_segments(dem, path, wind_vector=np.array([0, 0]), mass=24.0, pack=None):
+    return route_segments_many(dem, [path], wind_vector, mass, pack)[0]
+
+
+def route_energy(segments):
+    return float(segments["cum_energy"][-1]) if len(segments) else 0.0
+
+
+def exceeds_pack(segments, pack=None, battery=100.0):
+    # True when the route needs more than `battery` % of the pack
+    pack = pack_wh() if pack is None else pack
+    return route_energy(segments) > battery / 100 * pack
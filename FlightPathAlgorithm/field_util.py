@@ -0,0 +1,172 @@
+import heapq
+import os
+import shutil
+import threading
+import uuid
+from collections import OrderedDict
+from contextlib import nullcontext
+import numpy as np
+from path_util import NEIGHBOURS
+from cost_util import dem_hash, get_edge_costs, wind_key, quantize_wind
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache")
+
+MAX_FIELDS = 4  # fields kept in memory, about 27 MB each at 779x2494
+MAX_DISK_FIELDS = 16  # fields kept in cache_dir
+
+_field_cache = OrderedDict()
+_field_lock = threading.Lock()
+_build_locks = {}
+
+
+def multi_source_dijkstra(costs, sources, targets=None):
+    # One Dijkstra pass from every station at once. For each cell: the fastest time from any station,
+    # the predecessor on that route and the index of the station it starts from (-1 if unreachable).
+    # With targets, the pass stops as soon as all of those cells are settled.
+    _, h, w = costs.shape
+    flat_costs = costs.reshape(len(NEIGHBOURS), h * w)
+    offsets = [dr * w + dc for dr, dc in NEIGHBOURS]
+    cost = np.full(h * w, np.inf)
+    came_from = np.full(h * w, -1, dtype=np.int32)
+    label = np.full(h * w, -1, dtype=np.int16)
+    closed = np.zeros(h * w, dtype=np.uint8)
+    frontier = []
+    for i, (r, c) in enumerate(sources):
+        s = r * w + c
+        cost[s] = 0
+        label[s] = i
+        heapq.heappush(frontier, (0.0, s))
+    remaining = None if targets is None else {r * w + c for r, c in targets}
+    while frontier:
+        g, current = heapq.heappop(frontier)
+        if closed[current]:
+            continue
+        closed[current] = 1
+        if remaining is not None:
+            remaining.discard(current)
+            if not remaining:
+                break
+        station = label[current]
+        for k, off in enumerate(offsets):
+            step = flat_costs[k][current]
+            if step == np.inf:
+                continue
+            nxt = current + off
+            new_cost = g + step
+            if new_cost < cost[nxt]:
+                cost[nxt] = new_cost
+                came_from[nxt] = current
+                label[nxt] = station
+                heapq.heappush(frontier, (new_cost, nxt))
+    return cost.reshape(h, w), came_from.reshape(h, w), label.reshape(h, w)
+
+
+def field_key(dem, sources, wind_vector, wind_bucket=None, dem_version=None):
+    # wind_bucket and dem_version: wind_key(wind_vector) and dem_hash(dem)[:16] when the caller already has them
+    stations = "-".join(f"{r}x{c}" for r, c in sources)
+    return f"{dem_version or dem_hash(dem)[:16]}_{stations}_{wind_bucket or wind_key(wind_vector)}"
+
+
+def _load(path):
+    return tuple(np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r") for name in ("cost", "came_from", "label"))
+
+
+def _save(path, field):
+    # Written under a name of its own and renamed into place; a copy another process finished first wins
+    tmp = f"{path}.tmp-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+    try:
+        os.makedirs(tmp)
+        for name, arr in zip(("cost", "came_from", "label"), field):
+            np.save(os.path.join(tmp, f"{name}.npy"), arr)
+        os.replace(tmp, path)
+    except OSError:
+        if not os.path.isdir(path):
+            raise
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def _evict_disk(cache_dir, keep=MAX_DISK_FIELDS):
+    # Drop the least recently used fields beyond `keep`; loads touch a field's directory
+    entries = [e for e in os.scandir(cache_dir) if e.is_dir() and ".tmp-" not in e.name]
+    entries.sort(key=lambda e: e.stat().st_mtime, reverse=True)
+    for entry in entries[keep:]:
+        shutil.rmtree(entry.path, ignore_errors=True)
+
+
+def peek_dispatch_field(dem, sources, wind_vector=np.array([0, 0]), cache_dir=CACHE_DIR, wind_bucket=None,
+                        dem_version=None):
+    # The field from memory or the on-disk copy, None where it would have to be computed
+    key = field_key(dem, sources, wind_vector, wind_bucket, dem_version)
+    with _field_lock:
+        if key in _field_cache:
+            _field_cache.move_to_end(key)
+            return _field_cache[key]
+    path = os.path.join(cache_dir, key) if cache_dir else None
+    if not (path and os.path.isdir(path)):
+        return None
+    try:
+        field = _load(path)
+        os.utime(path)
+    except OSError:
+        return None  # evicted meanwhile
+    with _field_lock:
+        _field_cache[key] = field
+        while len(_field_cache) > MAX_FIELDS:
+            _field_cache.popitem(last=False)
+    return field
+
+
+def get_dispatch_field(dem, sources, wind_vector=np.array([0, 0]), cache_dir=CACHE_DIR, wind_bucket=None,
+                       dem_version=None, serial=None):
+    # Memory first, then the on-disk copy (memory-mapped, so a restarted planner answers at once), then compute.
+    # Concurrent requests for the same field wait for a single build; both caches are LRUs. `serial`, a lock held
+    # around loads and builds only, lets a caller run one at a time while memory hits never wait on it.
+    key = field_key(dem, sources, wind_vector, wind_bucket, dem_version)
+    with _field_lock:
+        if key in _field_cache:
+            _field_cache.move_to_end(key)
+            return _field_cache[key]
+        build_lock = _build_locks.setdefault(key, threading.Lock())
+    try:
+        with build_lock, serial or nullcontext():
+            with _field_lock:
+                if key in _field_cache:
+                    _field_cache.move_to_end(key)
+                    return _field_cache[key]
+            path = os.path.join(cache_dir, key) if cache_dir else None
+            if path and os.path.isdir(path):
+                field = _load(path)
+                os.utime(path)
+            else:
+                field = multi_source_dijkstra(get_edge_costs(dem, quantize_wind(wind_vector)), sources)
+                if path:
+                    os.makedirs(cache_dir, exist_ok=True)
+                    _save(path, field)
+                    _evict_disk(cache_dir)
+            with _field_lock:
+                _field_cache[key] = field
+                while len(_field_cache) > MAX_FIELDS:
+                    _field_cache.popitem(last=False)
+    finally:
+        # Also after a failed build, or the key's lock would stay in _build_locks for good
+        with _field_lock:
+            _build_locks.pop(key, None)
+    return field
+
+
+def route_from_field(field, goal):
+    # Best station index, its route (station first, goal last) and the flight time in seconds
+    cost, came_from, label = field
+    station = int(label[goal])
+    if station < 0:
+        return None, None, np.inf
+    w = cost.shape[1]
+    current = goal[0] * w + goal[1]
+    flat_came_from = came_from.reshape(-1)
+    path = [current]
+    while flat_came_from[current] >= 0:
+        current = int(flat_came_from[current])
+        path.append(current)
+    path.reverse()
+    return station, [divmod(p, w) for p in path], float(cost[goal])
@@ -0,0 +1,103 @@
+import numpy as np
+from path_util import lat1, lat2, lon1, lon2, h, w
+
+
+class GeoGrid:
+    # Cell <-> lat/lon conversions from a raster's affine transform (rasterio's Affine or any (a, b, c, d, e, f)),
+    # vectorized over arrays of points:
+    #   lon = a * col + b * row + c
+    #   lat = d * col + e * row + f
+    # Row/col are the upper-left corner of a cell, the same convention as pixeltocoordinate.
+
+    def __init__(self, transform, shape):
+        self.transform = tuple(float(v) for v in tuple(transform)[:6])
+        self.shape = tuple(shape)
+        a, b, _, d, e, _ = self.transform
+        self.det = a * e - b * d
+        if self.det == 0:
+            raise ValueError(f"Degenerate transform {self.transform}")
+
+    @classmethod
+    def from_bounds(cls, west, south, east, north, shape):
+        # North-up raster spanning the given lon/lat bounds
+        rows, cols = shape
+        return cls(((east - west) / cols, 0.0, west, 0.0, -(north - south) / rows, north), shape)
+
+    @classmethod
+    def legacy(cls, shape=(h, w)):
+        # The hard-coded output_4.tiff bounds from path_util, for in-memory DEMs without a transform; shape only
+        # sets the bounds check, the scale stays that of the full raster like pixeltocoordinate
+        return cls(((lon2 - lon1) / w, 0.0, lon1, 0.0, -(lat2 - lat1) / h, lat2), shape)
+
+    def to_latlon(self, rows, cols, center=False):
+        a, b, c, d, e, f = self.transform
+        rows = np.asarray(rows, dtype=float) + (0.5 if center else 0.0)
+        cols = np.asarray(cols, dtype=float) + (0.5 if center else 0.0)
+        return d * cols + e * rows + f, a * cols + b * rows + c
+
+    def to_fractional(self, lat, lon):
+        # Inverse transform: fractional (row, col) of each point
+        a, b, c, d, e, f = self.transform
+        x = np.asarray(lon, dtype=float) - c
+        y = np.asarray(lat, dtype=float) - f
+        return (a * y - d * x) / self.det, (e * x - b * y) / self.det
+
+    def contains(self, lat, lon):
+        rows, cols = self.to_fractional(lat, lon)
+        return (rows >= 0) & (rows < self.shape[0]) & (cols >= 0) & (cols < self.shape[1])
+
+    def to_cells(self, lat, lon, strict=True):
+        # Cells containing each point. Points outside the raster raise ValueError, or with strict=False come
+        # back as (-1, -1).
+        rows, cols = self.to_fractional(lat, lon)
+        rows, cols = np.floor(rows), np.floor(cols)
+        inside = (rows >= 0) & (rows < self.shape[0]) & (cols >= 0) & (cols < self.shape[1])
+        if strict and not inside.all():
+            lat_ = np.broadcast_to(lat, inside.shape)[~inside].ravel()[0]
+            lon_ = np.broadcast_to(lon, inside.shape)[~inside].ravel()[0]
+            raise ValueError(f"({lat_}, {lon_}) is outside the DEM"
+                             + (f" (and {int((~inside).sum()) - 1} more points)" if (~inside).sum() > 1 else ""))
+        return np.where(inside, rows, -1).astype(np.intp), np.where(inside, cols, -1).astype(np.intp)
+
+    def to_cell(self, lat, lon):
+        rows, cols = self.to_cells(np.array([lat]), np.array([lon]))
+        return int(rows[0]), int(cols[0])
+
+    def snap(self, lat, lon, valid=None, radius=8):
+        # Cells for each point, moved to the nearest cell where `valid` (an (h, w) mask, e.g. not nodata) is True
+        # within `radius` cells. Raises ValueError for points outside the raster or with no valid cell nearby.
+        rows, cols = self.to_cells(lat, lon)
+        if valid is None:
+            return rows, cols
+        rows, cols = np.atleast_1d(rows), np.atleast_1d(cols)
+        dr, dc = np.mgrid[-radius:radius + 1, -radius:radius + 1].reshape(2, -1)
+        order = np.argsort(dr ** 2 + dc ** 2, kind="stable")
+        dr, dc = dr[order], dc[order]
+        cand_r = rows[:, None] + dr[None, :]
+        cand_c = cols[:, None] + dc[None, :]
+        inside = (cand_r >= 0) & (cand_r < self.shape[0]) & (cand_c >= 0) & (cand_c < self.shape[1])
+        ok = inside & valid[np.clip(cand_r, 0, self.shape[0] - 1), np.clip(cand_c, 0, self.shape[1] - 1)]
+        if not ok.any(axis=1).all():
+            bad = int(np.nonzero(~ok.any(axis=1))[0][0])
+            raise ValueError(f"No valid cell within {radius} cells of ({rows[bad]}, {cols[bad]})")
+        pick = ok.argmax(axis=1)
+        index = np.arange(len(rows))
+        return cand_r[index, pick], cand_c[index, pick]
+
+    def geometry(self, path, decimals=6):
+        # [[lon, lat], ...] of a (row, col) path, the routes.json geometry
+        if len(path) == 0:
+            return []
+        cells = np.asarray(path)
+        lat, lon = self.to_latlon(cells[:, 0], cells[:, 1])
+        return np.round(np.column_stack([lon, lat]), decimals).tolist()
+
+    def geojson(self, paths, properties=None, decimals=6):
+        # FeatureCollection with one LineString per path
+        properties = properties or [{} for _ in paths]
+        return {
+            "type": "FeatureCollection",
+            "features": [{"type": "Feature", "properties": props,
+                          "geometry": {"type": "LineString", "coordinates": self.geometry(path, decimals)}}
+                         for path, props in zip(paths, properties)],
+        }
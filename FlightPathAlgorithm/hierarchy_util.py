@@ -0,0 +1,96 @@
+import numpy as np
+from path_util import lpixel
+from cost_util import edge_costs, mask_costs
+from search_util import astar_array, reconstruct_path_array
+from dem_util import DEMManager
+
+
+def downsample(dem, factor):
+    # Block mean, the same as DEMManager.overview
+    h, w = dem.shape[0] // factor, dem.shape[1] // factor
+    block = dem[:h * factor, :w * factor].reshape(h, factor, w, factor)
+    return block.mean(axis=(1, 3)).astype(dem.dtype)
+
+
+def corridor_mask(shape, coarse_path, factor, radius):
+    # Full-resolution cells within `radius` coarse cells of the coarse path
+    ch, cw = shape[0] // factor, shape[1] // factor
+    coarse = np.zeros((ch, cw), dtype=bool)
+    rows, cols = zip(*coarse_path)
+    coarse[list(rows), list(cols)] = True
+    grown = coarse.copy()
+    for dr in range(-radius, radius + 1):
+        for dc in range(-radius, radius + 1):
+            shifted = np.zeros_like(coarse)
+            shifted[max(0, dr):ch + min(0, dr), max(0, dc):cw + min(0, dc)] = \
+                coarse[max(0, -dr):ch + min(0, -dr), max(0, -dc):cw + min(0, -dc)]
+            grown |= shifted
+    # Rows/cols beyond the last full block belong to the edge block
+    row_idx = np.minimum(np.arange(shape[0]) // factor, ch - 1)
+    col_idx = np.minimum(np.arange(shape[1]) // factor, cw - 1)
+    return grown[np.ix_(row_idx, col_idx)]
+
+
+def astar_hierarchical(dem, start, goal, wind_vector=np.array([0, 0]), factor=8, radius=2, coarse_dem=None,
+                       stats=None):
+    # Plan on a downsampled DEM first, then run astar at full resolution only inside a corridor around the
+    # coarse route. The corridor is widened if the goal cannot be reached inside it. `dem` is an array or a
+    # DEMManager; a manager's overview pyramid supplies the coarse level and only the corridor's window is read
+    # at full resolution.
+    # Returns (path, cost) in full-resolution cells and seconds.
+    if isinstance(dem, DEMManager):
+        shape, read = dem.shape, dem.read
+        if coarse_dem is None:
+            coarse_dem = dem.overview(factor)
+    else:
+        shape, read = dem.shape, lambda r0, c0, r1, c1: dem[r0:r1, c0:c1]
+        if coarse_dem is None:
+            coarse_dem = downsample(dem, factor)
+    ch, cw = coarse_dem.shape
+    coarse_start = (min(start[0] // factor, ch - 1), min(start[1] // factor, cw - 1))
+    coarse_goal = (min(goal[0] // factor, ch - 1), min(goal[1] // factor, cw - 1))
+    coarse_stats = {}
+    coarse_costs = edge_costs(coarse_dem, wind_vector, pixel_size=lpixel * factor)
+    came_from, _ = astar_array(coarse_dem, coarse_start, coarse_goal, costs=coarse_costs, stats=coarse_stats)
+    coarse_path = reconstruct_path_array(came_from, coarse_start, coarse_goal, coarse_dem.shape)
+
+    fine_stats = {"expanded": 0, "pushed": 0, "reopened": 0}
+    while True:
+        mask = corridor_mask(shape, coarse_path, factor, radius)
+        rows, cols = np.nonzero(mask)
+        row0, row1, col0, col1 = int(rows.min()), int(rows.max()) + 1, int(cols.min()), int(cols.max()) + 1
+        window = read(row0, col0, row1, col1)
+        costs = mask_costs(edge_costs(window, wind_vector), mask[row0:row1, col0:col1])
+        local_start = (start[0] - row0, start[1] - col0)
+        local_goal = (goal[0] - row0, goal[1] - col0)
+        run = {}
+        came_from, cost_so_far = astar_array(window, local_start, local_goal, costs=costs, stats=run)
+        for k in fine_stats:
+            fine_stats[k] += run[k]
+        cost = cost_so_far[local_goal[0] * window.shape[1] + local_goal[1]]
+        if cost < np.inf or mask.all():
+            break
+        radius *= 2
+    path = [(r + row0, c + col0) for r, c in reconstruct_path_array(came_from, local_start, local_goal, window.shape)]
+    if stats is not None:
+        stats.update(fine_stats)
+        stats.update(coarse_expanded=coarse_stats["expanded"], corridor_cells=int(mask.sum()), radius=radius)
+    return path, float(cost)
+
+
+def hierarchical_gap(dem, start, goal, wind_vector=np.array([0, 0]), factor=8, radius=2):
+    # How far the hierarchical route is from the exact astar optimum, and what each search expanded; `dem` as for
+    # astar_hierarchical
+    full = dem.read(0, 0, *dem.shape) if isinstance(dem, DEMManager) else dem
+    exact_stats = {}
+    _, cost_so_far = astar_array(full, start, goal, costs=edge_costs(full, wind_vector), stats=exact_stats)
+    exact = float(cost_so_far[goal[0] * full.shape[1] + goal[1]])
+    hier_stats = {}
+    _, cost = astar_hierarchical(dem, start, goal, wind_vector, factor, radius, stats=hier_stats)
+    return {
+        "exact_cost": exact,
+        "hierarchical_cost": cost,
+        "gap": (cost - exact) / exact if exact else 0.0,
+        "exact_expanded": exact_stats["expanded"],
+        "hierarchical_expanded": hier_stats["expanded"] + hier_stats["coarse_expanded"],
+    }
@@ -0,0 +1,118 @@
+import os
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from path_util import lpixel
+
+# Per-cell landability index: terrain slope and roughness, and the nearest cell that is suitable for a drop
+INDEX_DTYPE = np.dtype([("slope", "f4"), ("roughness", "f4"), ("row", "i2"), ("col", "i2"), ("distance", "f4")])
+MAX_SLOPE = 15.0  # degrees
+MAX_ROUGHNESS = 4.0  # m, RMS of the terrain around its 3x3 local mean
+MAX_DISTANCE = 32  # cells, how far the index looks for a drop cell (1.5 km at 47 m per pixel)
+
+
+def box_mean(a, size=3):
+    # Mean over a size x size window, edges padded by repetition
+    pad = size // 2
+    return sliding_window_view(np.pad(a, pad, mode="edge"), (size, size)).mean(axis=(2, 3))
+
+
+def slope_degrees(dem, resolution=lpixel):
+    dz_dy, dz_dx = np.gradient(dem.astype(np.float64), resolution)
+    return np.degrees(np.arctan(np.hypot(dz_dx, dz_dy)))
+
+
+def roughness(dem, size=3):
+    # RMS deviation from the local mean, so an even slope is smooth and boulders, ridges and gullies are not
+    dem = dem.astype(np.float64)
+    residual = dem - box_mean(dem, size)
+    return np.sqrt(box_mean(residual ** 2, size))
+
+
+def nearest_seed(seeds, max_distance=32):
+    # Exact nearest seed cell of every cell within max_distance cells, as a separable transform: first the nearest
+    # seed row in each column (one sweep down and one up), then for every column offset k within max_distance the
+    # candidate k**2 + (row distance in column c + k)**2. Returns (rows, cols, distance in cells); -1, -1 and inf
+    # where no seed is that close.
+    h, w = seeds.shape
+    index = np.arange(h)[:, None]
+    above = np.where(seeds, index, -h - max_distance - 1)
+    np.maximum.accumulate(above, axis=0, out=above)
+    below = np.where(seeds, index, 2 * h + max_distance + 1)
+    below = np.minimum.accumulate(below[::-1], axis=0)[::-1]
+    column_row = np.where(index - above <= below - index, above, below).astype(np.int32)
+    # Row distances past max_distance can never win, capping them keeps the squares in int32
+    column_d2 = np.minimum(np.abs(column_row - index), max_distance + 1).astype(np.int32) ** 2
+    column_index = np.broadcast_to(np.arange(w, dtype=np.int32), (h, w))
+    best = np.full((h, w), np.iinfo(np.int32).max, dtype=np.int32)
+    rows = np.full((h, w), -1, dtype=np.int32)
+    cols = np.full((h, w), -1, dtype=np.int32)
+    span = min(max_distance, w - 1)
+    for k in range(-span, span + 1):
+        # Candidates from column c + k, for the columns where that exists
+        dst = (slice(None), slice(max(0, -k), w - max(0, k)))
+        src = (slice(None), slice(max(0, k), w - max(0, -k)))
+        d2 = column_d2[src] + k * k
+        closer = d2 < best[dst]
+        np.copyto(best[dst], d2, where=closer)
+        np.copyto(rows[dst], column_row[src], where=closer)
+        np.copyto(cols[dst], column_index[src], where=closer)
+    found = best <= max_distance ** 2
+    distance = np.where(found, np.sqrt(np.where(found, best, 0)), np.inf)
+    return np.where(found, rows, -1), np.where(found, cols, -1), distance
+
+
+def build_index(dem, valid=None, max_slope=MAX_SLOPE, max_roughness=MAX_ROUGHNESS, max_distance=MAX_DISTANCE,
+                resolution=lpixel):
+    # One vectorized pass over the whole DEM
+    index = np.empty(dem.shape, dtype=INDEX_DTYPE)
+    index["slope"] = slope_degrees(dem, resolution)
+    index["roughness"] = roughness(dem)
+    suitable = (index["slope"] <= max_slope) & (index["roughness"] <= max_roughness)
+    if valid is not None:
+        suitable &= valid
+    index["row"], index["col"], index["distance"] = nearest_seed(suitable, max_distance)
+    return index
+
+
+def index_path(raster_path, max_slope=MAX_SLOPE, max_roughness=MAX_ROUGHNESS, max_distance=MAX_DISTANCE):
+    if not raster_path:
+        return None
+    return f"{raster_path}.landing-s{max_slope:g}-r{max_roughness:g}-d{max_distance}.npy"
+
+
+class LandingIndex:
+    # Safe drop cells by table lookup. For a GeoTIFF the index is built once and kept next to the raster as a
+    # memory-mapped .npy (rebuilt when the raster is newer), like the DEM overviews; in-memory DEMs keep it in RAM.
+
+    def __init__(self, index):
+        self.index = index
+
+    @classmethod
+    def for_dem(cls, dem_manager, dem, valid=None, max_slope=MAX_SLOPE, max_roughness=MAX_ROUGHNESS,
+                max_distance=MAX_DISTANCE):
+        path = index_path(dem_manager.path, max_slope, max_roughness, max_distance)
+        if path and os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(dem_manager.path):
+            return cls(np.load(path, mmap_mode="r"))
+        index = build_index(dem, valid, max_slope, max_roughness, max_distance)
+        if path:
+            np.save(path, index)
+            index = np.load(path, mmap_mode="r")
+        return cls(index)
+
+    def is_safe(self, cell):
+        return self.index["distance"][cell] == 0
+
+    def safe_cell(self, cell, radius):
+        # Nearest suitable cell within `radius` cells of `cell` (radius up to the index's max_distance), or None
+        entry = self.index[cell]
+        if entry["distance"] > radius:
+            return None
+        return int(entry["row"]), int(entry["col"])
+
+    def safe_cells(self, rows, cols, radius):
+        # Batch form of safe_cell: (rows, cols, found), the input cell kept where nothing is in range
+        entries = self.index[rows, cols]
+        found = entries["distance"] <= radius
+        rows = np.where(found, entries["row"], rows).astype(np.intp)
+        cols = np.where(found, entries["col"], cols).astype(np.intp)
+        return rows, cols, found
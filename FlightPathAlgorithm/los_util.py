@@ -0,0 +1,89 @@
+import numpy as np
+from path_util import altitude_velocity, velocity, lpixel
+
+
+def bilinear(dem, rows, cols):
+    # DEM elevation at fractional (row, col) positions, any array shape
+    h, w = dem.shape
+    rows = np.clip(rows, 0, h - 1)
+    cols = np.clip(cols, 0, w - 1)
+    r0 = np.minimum(rows.astype(np.intp), h - 2)
+    c0 = np.minimum(cols.astype(np.intp), w - 2)
+    tr, tc = rows - r0, cols - c0
+    top = dem[r0, c0] * (1 - tc) + dem[r0, c0 + 1] * tc
+    bottom = dem[r0 + 1, c0] * (1 - tc) + dem[r0 + 1, c0 + 1] * tc
+    return top * (1 - tr) + bottom * tr
+
+
+def sample_segments(dem, starts, ends, step=0.5):
+    # Elevations every `step` pixels along many straight segments at once. Returns (z, points, valid, ds):
+    # z and points are padded to the longest segment, valid marks real samples, ds is each segment's spacing.
+    starts = np.asarray(starts, dtype=float).reshape(-1, 2)
+    ends = np.asarray(ends, dtype=float).reshape(-1, 2)
+    lengths = np.hypot(*(ends - starts).T)
+    intervals = np.maximum(np.ceil(lengths / step).astype(np.intp), 1)
+    k = np.arange(intervals.max() + 1)
+    valid = k[None, :] <= intervals[:, None]
+    t = np.minimum(k[None, :] / intervals[:, None], 1.0)
+    points = starts[:, None, :] + t[..., None] * (ends - starts)[:, None, :]
+    z = bilinear(dem, points[..., 0], points[..., 1])
+    return z, points, valid, lengths / intervals
+
+
+def segment_times(dem, starts, ends, wind_vector=np.array([0, 0]), step=0.5):
+    # Flight time of straight segments at cruise speed along their unit direction, plus climb time wherever the
+    # terrain between two samples rises faster than altitude_velocity allows at that speed (the astar rule).
+    # A (h, w, 2) wind raster is sampled under each interval.
+    starts = np.asarray(starts, dtype=float).reshape(-1, 2)
+    ends = np.asarray(ends, dtype=float).reshape(-1, 2)
+    z, points, valid, ds = sample_segments(dem, starts, ends, step)
+    delta = ends - starts
+    lengths = np.hypot(*delta.T)
+    unit = delta / np.where(lengths > 0, lengths, 1)[:, None]
+    wind = np.asarray(wind_vector, dtype=float)
+    if wind.ndim == 3:
+        cells = np.rint(points[:, :-1]).astype(np.intp)
+        wind = wind[cells[..., 0], cells[..., 1]]
+    else:
+        wind = wind[None, None, :]
+    ground = unit[:, None, :] * velocity + wind
+    speed = np.hypot(ground[..., 0], ground[..., 1]) / lpixel
+    travel = ds[:, None] / speed
+    rise = np.diff(z, axis=1)
+    allowance = altitude_velocity * ds / (velocity / lpixel)
+    climb = np.where(rise > allowance[:, None], rise / altitude_velocity, 0)
+    return np.where(valid[:, 1:], travel + climb, 0).sum(axis=1)
+
+
+def path_time(dem, path, wind_vector=np.array([0, 0]), step=0.5):
+    # Flight time of a polyline of (row, col) waypoints under segment_times
+    points = np.asarray(path, dtype=float)
+    if len(points) < 2:
+        return 0.0
+    return float(segment_times(dem, points[:-1], points[1:], wind_vector, step).sum())
+
+
+def simplify_path(dem, path, wind_vector=np.array([0, 0]), max_span=256, step=0.5):
+    # Line-of-sight string pulling: from each kept waypoint jump to the farthest later cell (at most max_span
+    # steps ahead) whose straight segment is no slower than the grid steps it replaces. All candidates of one
+    # waypoint are checked in a single segment_times call. Returns (waypoints, flight time).
+    points = np.asarray(path, dtype=float)
+    n = len(points)
+    if n < 3:
+        return [tuple(p) for p in path], path_time(dem, path, wind_vector, step)
+    steps = segment_times(dem, points[:-1], points[1:], wind_vector, step)
+    elapsed = np.concatenate([[0.0], np.cumsum(steps)])
+    keep, total, i = [0], 0.0, 0
+    while i < n - 1:
+        ahead = np.arange(i + 2, min(i + max_span, n - 1) + 1)
+        best, best_time = i + 1, steps[i]
+        if len(ahead):
+            times = segment_times(dem, np.repeat(points[i:i + 1], len(ahead), axis=0), points[ahead], wind_vector,
+                                  step)
+            ok = np.nonzero(times <= elapsed[ahead] - elapsed[i] + 1e-9)[0]
+            if len(ok):
+                best, best_time = ahead[ok[-1]], times[ok[-1]]
+        keep.append(int(best))
+        total += best_time
+        i = best
+    return [tuple(path[k]) for k in keep], float(total)
@@ -1,64 +1,44 @@
-from path_util import (load_dem, astar, reconstruct_path,summarize_battery_and_elevation,wind_vector,coordinatetopixel,onecall_key)
-import numpy as np
-import matplotlib.pyplot as plt
-import requests
-import cdsapi
-c=cdsapi.Client()
-def draw(lat,lon):
-    url = f"https://api.openweathermap.org/data/2.5/onecall?lat={lat}&lon={lon}&appid={onecall_key}"
-    response = requests.get(url)
-    weather_data = response.json()
-    goal=tuple (int(x) for x in coordinatetopixel(lat,lon))
+from path_util import (summarize_battery_and_elevation,onecall_key,start_points)
+from dem_util import DEMManager
+from planner import plan_from_stations
+from weather_util import OneCallWeather, StubWeather, WeatherCache, WindField
+dem_file = "output_4.tiff"
+dem_manager = None
+wind_field = None
+
+def get_dem_manager():
+    # The raster is opened once, not on every alert; overviews are built when a coarse search first asks for one
+    global dem_manager
+    if dem_manager is None:
+        dem_manager = DEMManager(dem_file)
+    return dem_manager
+
+def get_wind_field():
+    # Per-cell wind over the whole DEM from cached One Call answers, rebuilt at most once per TTL
+    global wind_field
+    if wind_field is None:
+        provider = OneCallWeather(onecall_key) if onecall_key else StubWeather()
+        wind_field = WindField(WeatherCache(provider), get_dem_manager().shape, grid=get_dem_manager().grid)
+    return wind_field
+
+def draw(lat,lon,show=True):
+    goal=get_dem_manager().grid.to_cell(lat,lon)
     print(goal)
-    dem_file = "output_4.tiff"
-    dem, transform = load_dem(dem_file)
-
-    start_points = [
-        (388, 669),  # Bovec
-        (282, 1149),  # Trenta
-        (546, 1631)  # Bohinjska Bistrica
-    ]
-
-
-    all_paths = []
-    all_costs = []
-
-    # Run A* for each start point
-    for start in start_points:
-        came_from, cost_so_far = astar(dem, start, goal, wind_vector=wind_vector)
-        path = reconstruct_path(came_from, start, goal)
-        all_paths.append(path)
-        all_costs.append(cost_so_far[goal])
-
-    # Find the index of the shortest route (min time)
-    shortest_index = np.argmin(all_costs)
-    shortest_path = all_paths[shortest_index]
-    print(shortest_path)
-    # Plot the paths and points
-    plt.figure(figsize=(10, 10))
-    plt.imshow(dem, cmap='terrain')
-
-    # Plot all paths
-    for idx, path in enumerate(all_paths):
-        y, x = zip(*path)
-        color = 'blue' if idx == shortest_index else 'orange'
-        plt.plot(x, y, color=color, linewidth=2)
-
-    # Plot start points
-    for start in start_points:
-        plt.plot(start[1], start[0], 'go', markersize=8)
-
-    # Plot goal point
-    plt.plot(goal[1], goal[0], 'ro', markersize=8)
-
-    plt.title("Paths to Destination")
-    plt.xlabel("X")
-    plt.ylabel("Y")
-    plt.colorbar(label='Elevation (m)')
-    plt.grid(True)
-    plt.show()
+    # Only the window around the stations and the goal is read; the search runs in window coordinates
+    dem, (row0, col0) = get_dem_manager().read_around(start_points + [goal])
+    starts = [(r - row0, c - col0) for r, c in start_points]
+    local_goal = (goal[0] - row0, goal[1] - col0)
+    wind_vector = get_wind_field().raster()[row0:row0 + dem.shape[0], col0:col0 + dem.shape[1]]
+
+    result = plan_from_stations(dem, local_goal, starts, wind_vector=wind_vector)
+    print([(r + row0, c + col0) for r, c in result["path"]])
+    if show:
+        from viz_util import plot_paths
+        plot_paths(dem, result["paths"], result["best"], start_points, goal, offset=(row0, col0))
 
     # Print energy and time for shortest route
-    summarize_battery_and_elevation(dem, shortest_path, wind_vector=wind_vector)
+    summarize_battery_and_elevation(dem, result["path"], wind_vector=wind_vector, show=show)
+    return result
 
-draw (46.376677, 13.837065)
\ No newline at end of file
+if __name__ == "__main__":
+    draw (46.376677, 13.837065)
\ No newline at end of file
@@ -1,14 +1,20 @@
 import numpy as np
-import rasterio
 import heapq
-import matplotlib.pyplot as plt
-from dotenv import load_dotenv
 import os
-load_dotenv()
 
-accuweather_key = os.getenv("ACCUWEATHER_API_KEY")
-tomorrow_key = os.getenv("TOMORROW_API_KEY")
-onecall_key = os.getenv("ONECALL_API_KEY")
+# rasterio, matplotlib and dotenv are imported where they are used so planning stays cheap to import
+_api_keys = {
+    "accuweather_key": "ACCUWEATHER_API_KEY",
+    "tomorrow_key": "TOMORROW_API_KEY",
+    "onecall_key": "ONECALL_API_KEY",
+}
+
+def __getattr__(name):
+    if name in _api_keys:
+        from dotenv import load_dotenv
+        load_dotenv()
+        return os.getenv(_api_keys[name])
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 velocity=15
 lpixel=47
@@ -43,6 +49,12 @@ goal=(292,1348)#triglav
 #goal=(165,1586)#Zgornja Radovna
 wind_vector = np.array([0,0])  # Wind blowing from left to right
 
+start_points = [
+    (388, 669),  # Bovec
+    (282, 1149),  # Trenta
+    (546, 1631)  # Bohinjska Bistrica
+]
+
 def pixeltocoordinate (x,y):
     lat=lat2-x*(lat2-lat1)/h
     lon=lon1+y*(lon2-lon1)/w
@@ -55,6 +67,7 @@ def coordinatetopixel (lat,lon):
     return (x,y)
 
 def load_dem(path):
+    import rasterio
     with rasterio.open(path) as src:
         dem = src.read(1)
         transform = src.transform
@@ -85,20 +98,63 @@ def travel_time(dx, movement_vector, wind_vector):
 
     return dx / effective_speed
 
-def heuristic(a, b):
-    return np.linalg.norm(np.array(a) - np.array(b))
-
-def astar(dem, start, goal, dx=1.0, wind_vector=np.array([0, 0])):
+NEIGHBOURS = [(dr, dc) for dr in (-1, 0, 1) for dc in (-1, 0, 1) if dr or dc]
+_vertex_cache = {}
+
+def step_times(wind_vector):
+    # Flight time of each NEIGHBOURS move without climbing
+    return [travel_time(np.linalg.norm([dr, dc]), np.array([dr, dc]), wind_vector) for dr, dc in NEIGHBOURS]
+
+def heuristic_vertices(times):
+    # Vertices of the polygon {y : y.m <= t_m for every move m}. max(y.d) over them is the least time to cover
+    # a displacement d with 8-neighbour moves when climbs are free (LP duality), so it never overestimates and
+    # changes by at most one step cost per step: admissible and consistent, in seconds like cost_so_far.
+    key = tuple(float(t) for t in times)
+    if key not in _vertex_cache:
+        moves = [(m, t) for m, t in zip(NEIGHBOURS, key) if np.isfinite(t)]
+        vertices = []
+        for i in range(len(moves)):
+            for j in range(i + 1, len(moves)):
+                (a, ta), (b, tb) = moves[i], moves[j]
+                det = a[0] * b[1] - a[1] * b[0]
+                if det == 0:
+                    continue
+                y = ((ta * b[1] - a[1] * tb) / det, (a[0] * tb - b[0] * ta) / det)
+                if all(y[0] * m[0] + y[1] * m[1] <= t * (1 + 1e-9) for m, t in moves):
+                    vertices.append(y)
+        _vertex_cache[key] = vertices
+    return _vertex_cache[key]
+
+def time_lower_bound(vertices, dr, dc):
+    best = 0.0
+    for vr, vc in vertices:
+        t = vr * dr + vc * dc
+        if t > best:
+            best = t
+    return best * (1 - 1e-9)  # keeps rounding on the admissible side
+
+def heuristic(a, b, wind_vector=np.array([0, 0])):
+    # Least possible flight time in seconds from b to a, including the wind
+    return time_lower_bound(heuristic_vertices(step_times(wind_vector)), a[0] - b[0], a[1] - b[1])
+
+def astar(dem, start, goal, dx=1.0, wind_vector=np.array([0, 0]), stats=None):
     h, w = dem.shape
     frontier = []
     heapq.heappush(frontier, (0, start))
     came_from = {}
     cost_so_far = {start: 0}
+    vertices = heuristic_vertices(step_times(wind_vector))
+    closed = set()
+    expanded = pushed = reopened = 0
     while frontier:
         _, current = heapq.heappop(frontier)
 
         if current == goal:
             break
+        if current in closed:
+            continue  # stale entry, the node was already expanded with a lower cost
+        closed.add(current)
+        expanded += 1
         for dx_ in [-1, 0, 1]:
 
             for dy_ in [-1, 0, 1]:
@@ -125,9 +181,15 @@ def astar(dem, start, goal, dx=1.0, wind_vector=np.array([0, 0])):
                     new_cost = cost_so_far[current] + time
                     if next_node not in cost_so_far or new_cost < cost_so_far[next_node]:
                         cost_so_far[next_node] = new_cost
-                        priority = new_cost + heuristic(goal, next_node)
+                        priority = new_cost + time_lower_bound(vertices, goal[0] - next_node[0], goal[1] - next_node[1])
                         heapq.heappush(frontier, (priority, next_node))
                         came_from[next_node] = current
+                        pushed += 1
+                        if next_node in closed:
+                            closed.discard(next_node)
+                            reopened += 1
+    if stats is not None:
+        stats.update(expanded=expanded, pushed=pushed, reopened=reopened)
     return came_from, cost_so_far
 def requests():
     return (0)
@@ -143,40 +205,24 @@ def reconstruct_path(came_from, start, goal):
     return path
 
 def plot_path(dem, path):
-    plt.imshow(dem, cmap='terrain')
-    y, x = zip(*path)
-    plt.plot(x, y, 'r-', linewidth=2)
-    plt.title("Path over Elevation Map")
-    plt.xlabel("X")
-    plt.ylabel("Y")
-    plt.colorbar(label='Elevation (m)')
-    plt.show()
-
-def summarize_battery_and_elevation(dem, path, wind_vector=np.array([0, 0]), mass=24.0):
-    total_energy = 0
-    total_time = 0
+    from viz_util import plot_path
+    plot_path(dem, path)
+
+def route_summary(dem, path, wind_vector=np.array([0, 0]), mass=24.0):
+    # Flight time (s), energy (Wh) and elevation profile of a path, as data; "segments" holds the per-step
+    # record array from energy_util
+    from energy_util import route_segments
+    segments = route_segments(dem, path, wind_vector, mass)
     elevations = [dem[p[0], p[1]] for p in path]
-    distances = list(range(len(elevations)))
-    for i in range(len(path)-1):
-        p1 = path[i]
-        p2 = path[i+1]
-        movement_vector = np.array([p2[0] - p1[0], p2[1] - p1[1]])
-        dx = np.linalg.norm(movement_vector)
-
-        energy = energy_cost(dem[p1[0], p1[1]], dem[p2[0], p2[1]], dx, movement_vector, mass)
-        time = travel_time(dx, movement_vector, wind_vector)
-        total_energy += energy
-        total_time += time
-
-    print(f"Total Energy Consumption (approx.): {total_energy:.2f} Wh")
-    print(f"Total Estimated Travel Time: {total_time:.2f} seconds")
-
-    plt.figure()
-    plt.plot(distances, elevations, label="Elevation Profile")
-    plt.title("Elevation Along the Path")
-    plt.xlabel("Step")
-    plt.ylabel("Elevation (m)")
-    plt.grid(True)
-    plt.legend()
-    plt.show()
-    return (total_time)
+    return {"time": float(segments["time"].sum()), "energy": float(segments["energy"].sum()),
+            "elevations": elevations, "segments": segments}
+
+def summarize_battery_and_elevation(dem, path, wind_vector=np.array([0, 0]), mass=24.0, show=True):
+    summary = route_summary(dem, path, wind_vector, mass)
+    print(f"Total Energy Consumption (approx.): {summary['energy']:.2f} Wh")
+    print(f"Total Estimated Travel Time: {summary['time']:.2f} seconds")
+
+    if show:
+        from viz_util import plot_elevation
+        plot_elevation(summary["elevations"])
+    return (summary["time"])
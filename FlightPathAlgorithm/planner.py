@@ -0,0 +1,341 @@
+import json
+import logging
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+import numpy as np
+from path_util import start_points, route_summary
+from cost_util import get_edge_costs, dem_hash, wind_key
+from cache_util import RouteCache, extend_route
+from search_util import astar_array, reconstruct_path_array, astar_battery
+from energy_util import battery_budget, route_segments, route_energy, edge_energies
+from los_util import simplify_path, segment_times, path_time
+from geo_util import GeoGrid
+from landing_util import LandingIndex
+from dem_util import DEMManager
+from field_util import CACHE_DIR, get_dispatch_field, peek_dispatch_field, route_from_field
+from weather_util import CALM, StubWeather, WindField
+
+logger = logging.getLogger(__name__)
+
+STATIONS = [
+    {"id": "S1", "name": "Bovec", "cell": start_points[0]},
+    {"id": "S2", "name": "Trenta", "cell": start_points[1]},
+    {"id": "S3", "name": "Bohinjska Bistrica", "cell": start_points[2]},
+]
+
+
+def load_stations(path, grid=None):
+    # Station list in the dashboard's stations.json shape (id, name, lat, lon)
+    with open(path) as f:
+        stations = json.load(f)
+    grid = grid or GeoGrid.legacy()
+    rows, cols = grid.to_cells([s["lat"] for s in stations], [s["lon"] for s in stations])
+    for station, row, col in zip(stations, rows, cols):
+        station["cell"] = (int(row), int(col))
+    return stations
+
+
+def route_record(path, station, lat, lon, flight_time, drone_id=None, grid=None, **extra):
+    # A planned route in the dashboard's routes.json schema
+    record = {
+        "droneId": drone_id,
+        "routeId": f"RT-{station['id']}-{uuid.uuid4().hex[:8]}",
+        "stationId": station["id"],
+        "geometry": (grid or GeoGrid.legacy()).geometry(path),
+        "destination": {"lat": lat, "lon": lon},
+        "flightTime": round(flight_time, 1),
+        "createdAt": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+    }
+    record.update(extra)
+    return record
+
+
+def plan_from_stations(dem, goal, starts, wind_vector=np.array([0, 0]), mass=24.0):
+    # Headless planning: every station's route to the goal, the fastest one and its time/energy, as data
+    costs = get_edge_costs(dem, wind_vector)
+    paths, times = [], []
+    for start in starts:
+        came_from, cost_so_far = astar_array(dem, start, goal, costs=costs)
+        paths.append(reconstruct_path_array(came_from, start, goal, dem.shape))
+        times.append(float(cost_so_far[goal[0] * dem.shape[1] + goal[1]]))
+    best = int(np.argmin(times))
+    summary = route_summary(dem, paths[best], wind_vector, mass)
+    return {"paths": paths, "times": times, "best": best, "path": paths[best], "time": times[best],
+            "energy": summary["energy"], "elevations": summary["elevations"]}
+
+
+class Planner:
+    # Long-running route planner: the DEM, the stations and the dispatch fields are loaded once at startup and
+    # every request is answered from memory by a worker pool.
+
+    def __init__(self, dem_source="output_4.tiff", stations=None, weather=None, workers=4, cache_dir=CACHE_DIR,
+                 wind_lattice=None, any_angle=False, route_cache=None, drop_radius=None):
+        self.dem_manager = DEMManager(dem_source)
+        self.dem = self.dem_manager.read_all()
+        self.dem_version = dem_hash(self.dem)[:16]
+        self.grid = self.dem_manager.grid
+        # Goals on nodata cells are moved to the nearest cell with terrain
+        self.valid = self.dem != self.dem_manager.nodata if self.dem_manager.nodata is not None else None
+        self.stations = stations or STATIONS
+        # Stations given by lat/lon are placed with this DEM's transform
+        for station in self.stations:
+            if "lat" in station:
+                station["cell"] = self.grid.to_cell(station["lat"], station["lon"])
+        self.cells = [tuple(int(v) for v in s["cell"]) for s in self.stations]
+        for station, (r, c) in zip(self.stations, self.cells):
+            if not (0 <= r < self.dem.shape[0] and 0 <= c < self.dem.shape[1]):
+                raise ValueError(f"Station {station['id']} at cell ({r}, {c}) is outside the "
+                                 f"{self.dem.shape[0]}x{self.dem.shape[1]} DEM")
+        self.weather = weather or StubWeather()
+        # With a wind lattice (e.g. (3, 3)) routes use a per-cell wind raster instead of one vector per alert
+        self.wind_field = (WindField(self.weather, self.dem.shape, lattice=wind_lattice, grid=self.grid)
+                           if wind_lattice else None)
+        self.cache_dir = cache_dir
+        # Routes as line-of-sight waypoints (los_util) rather than one point per grid cell
+        self.any_angle = any_angle
+        # Repeat alerts near a known location are answered from here without touching the field
+        self.route_cache = route_cache if route_cache is not None else RouteCache()
+        # With a drop radius (cells) routes end at the nearest flat, even cell to the alert instead of on the alert
+        self.drop_radius = drop_radius
+        self.landing = LandingIndex.for_dem(self.dem_manager, self.dem, self.valid) if drop_radius else None
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        # Fields for new winds are built here, one at a time, off the request path; a second build at once would
+        # only double the memory and CPU the first is already using
+        self.builder = ThreadPoolExecutor(max_workers=1, thread_name_prefix="field-build")
+        self._field_lock = threading.Lock()
+        self._building = set()
+        self._building_lock = threading.Lock()
+        self._wind_refresh = threading.Lock()
+        # Constant winds with a built field, most recent last: a new wind is answered from the nearest meanwhile
+        self._winds = OrderedDict()
+        # Edge costs of the last wind a search or a dispatch asked for, as (wind bytes, rasters)
+        self._costs = None
+        self._costs_lock = threading.Lock()
+        # Per-edge energies depend on the DEM alone; built on the first battery-constrained request
+        self._energies = None
+        self._energies_lock = threading.Lock()
+        # Warm the field for the current wind so the first alert is a lookup
+        self.field(*self.wind_bucket(*(float(v) for v in self.grid.to_latlon(*self.cells[0]))))
+
+    def wind(self, lat, lon):
+        return self.wind_bucket(lat, lon)[0]
+
+    def wind_bucket(self, lat, lon):
+        # The wind for an alert and its cache key. A failing weather provider means calm wind rather than a failed
+        # alert. A wind raster past its ttl is rebuilt, and its field warmed, in the background while requests keep
+        # the current one.
+        if self.wind_field is not None:
+            if self.wind_field.stale():
+                self.refresh_wind()
+            return self.wind_field.current()
+        try:
+            wind_vector = self.weather.wind(lat, lon)
+        except Exception as e:
+            logger.warning("Weather request for (%.3f, %.3f) failed, using calm wind: %s", lat, lon, e)
+            wind_vector = CALM
+        return wind_vector, wind_key(wind_vector)
+
+    def refresh_wind(self):
+        if not self._wind_refresh.acquire(blocking=False):
+            return  # already under way
+
+        def rebuild():
+            try:
+                raster, bucket = self.wind_field.build()
+                self.field(raster, bucket)
+                self.wind_field.publish(raster, bucket)
+            except Exception:
+                logger.exception("Wind field refresh failed")
+            finally:
+                self._wind_refresh.release()
+
+        self.builder.submit(rebuild)
+
+    def field(self, wind_vector, wind_bucket=None):
+        # Keyed on the DEM hash taken at startup, so a cache hit hashes nothing. Blocks while a missing field is
+        # built; requests use cached_field instead.
+        field = get_dispatch_field(self.dem, self.cells, wind_vector, cache_dir=self.cache_dir,
+                                   wind_bucket=wind_bucket, dem_version=self.dem_version, serial=self._field_lock)
+        if np.ndim(wind_vector) == 1:
+            with self._building_lock:
+                self._winds[wind_bucket or wind_key(wind_vector)] = np.asarray(wind_vector, dtype=float)
+                self._winds.move_to_end(wind_bucket or wind_key(wind_vector))
+        return field
+
+    def cached_field(self, wind_vector, wind_bucket=None):
+        # The field if it is in memory or on disk, else None with a build queued in the background
+        field = peek_dispatch_field(self.dem, self.cells, wind_vector, cache_dir=self.cache_dir,
+                                    wind_bucket=wind_bucket, dem_version=self.dem_version)
+        if field is None:
+            self.build_field(wind_vector, wind_bucket or wind_key(wind_vector))
+        return field
+
+    def build_field(self, wind_vector, wind_bucket):
+        with self._building_lock:
+            if wind_bucket in self._building:
+                return
+            self._building.add(wind_bucket)
+
+        def build():
+            try:
+                self.field(wind_vector, wind_bucket)
+            except Exception:
+                logger.exception("Field build for wind %s failed", wind_bucket)
+            finally:
+                with self._building_lock:
+                    self._building.discard(wind_bucket)
+
+        self.builder.submit(build)
+
+    def nearest_field(self, wind_vector):
+        # The cached field of the constant wind closest to wind_vector, as (field, wind), or (None, None)
+        if np.ndim(wind_vector) != 1:
+            return None, None
+        with self._building_lock:
+            winds = list(self._winds.items())
+        winds.sort(key=lambda item: float(np.hypot(*(item[1] - wind_vector))))
+        for bucket, wind in winds:
+            field = peek_dispatch_field(self.dem, self.cells, wind, cache_dir=self.cache_dir, wind_bucket=bucket,
+                                        dem_version=self.dem_version)
+            if field is not None:
+                return field, wind
+            with self._building_lock:
+                self._winds.pop(bucket, None)  # evicted from both caches
+        return None, None
+
+    def costs(self, wind_vector):
+        key = np.asarray(wind_vector, dtype=float).tobytes()
+        with self._costs_lock:
+            if self._costs is None or self._costs[0] != key:
+                self._costs = key, get_edge_costs(self.dem, wind_vector)
+            return self._costs[1]
+
+    def energies(self):
+        with self._energies_lock:
+            if self._energies is None:
+                self._energies = edge_energies(self.dem)
+            return self._energies
+
+    def goal_cell(self, lat, lon):
+        rows, cols = self.goal_cells([lat], [lon])
+        return int(rows[0]), int(cols[0])
+
+    def goal_cells(self, lats, lons):
+        # Cells for a batch of alerts in one call; ValueError if any lies outside the DEM
+        return self.grid.snap(np.asarray(lats, dtype=float), np.asarray(lons, dtype=float), self.valid)
+
+    def drop_cell(self, goal):
+        # The cell to fly to for an alert at `goal` and the record fields describing it. Without a suitable cell in
+        # range the route still ends on the alert, marked safeDrop: false.
+        if self.landing is None:
+            return goal, {}
+        cell = self.landing.safe_cell(goal, self.drop_radius)
+        safe = cell is not None
+        cell = cell or goal
+        lat, lon = self.grid.to_latlon(*cell)  # same corner convention as the route geometry
+        return cell, {"dropPoint": {"lat": round(float(lat), 6), "lon": round(float(lon), 6)}, "safeDrop": safe}
+
+    def plan(self, lat, lon, goal=None):
+        # Fastest station and route to (lat, lon), in the routes.json schema
+        goal, drop = self.drop_cell(goal or self.goal_cell(lat, lon))
+        wind_vector, wind_bucket = self.wind_bucket(lat, lon)
+        field = self.cached_field(wind_vector, wind_bucket)
+        if field is None:
+            return self.plan_meanwhile(lat, lon, goal, drop, wind_vector)
+        index = int(field[2][goal])
+        if index < 0:
+            raise ValueError(f"No station can reach ({lat}, {lon})")
+        key = self.route_cache.key(self.stations[index]["id"], goal, self.dem_version, wind_vector, wind_bucket)
+        entry = self.route_cache.get(key)
+        if entry is None:
+            _, path, cost = route_from_field(field, goal)
+            energy = route_energy(route_segments(self.dem, path, wind_vector))
+            if self.any_angle:
+                path, cost = simplify_path(self.dem, path, wind_vector)
+            self.route_cache.put(key, path, cost, energy)
+        else:
+            path, cost, energy = [tuple(p) for p in entry["waypoints"].tolist()], entry["time"], entry["energy"]
+            if path[-1] != goal:
+                # Cached for a nearby goal in the same bucket: fly on to this one
+                if self.any_angle:
+                    hop, hop_time = [goal], float(segment_times(self.dem, [path[-1]], [goal], wind_vector)[0])
+                else:
+                    hop, hop_time = extend_route(self.dem, path, goal, wind_vector)
+                cost += hop_time
+                energy += route_energy(route_segments(self.dem, path[-1:] + hop, wind_vector))
+                path = path + hop
+        return route_record(path, self.stations[index], lat, lon, cost, grid=self.grid, energy=round(energy, 2),
+                            **drop)
+
+    def plan_meanwhile(self, lat, lon, goal, drop, wind_vector):
+        # While the field for this wind is built in the background: the route the nearest wind's field gives, timed
+        # for the actual wind, or without any cached field an astar_array search from every station. Not route-cached.
+        field, _ = self.nearest_field(wind_vector)
+        if field is not None:
+            index, path, _ = route_from_field(field, goal)
+            if index is None:
+                raise ValueError(f"No station can reach ({lat}, {lon})")
+            cost = path_time(self.dem, path, wind_vector)
+        else:
+            costs = self.costs(wind_vector)
+            best = None
+            for i, start in enumerate(self.cells):
+                came_from, cost_so_far = astar_array(self.dem, start, goal, costs=costs)
+                time = cost_so_far[goal[0] * self.dem.shape[1] + goal[1]]
+                if time < np.inf and (best is None or time < best[0]):
+                    best = (float(time), i, reconstruct_path_array(came_from, start, goal, self.dem.shape))
+            if best is None:
+                raise ValueError(f"No station can reach ({lat}, {lon})")
+            cost, index, path = best
+        energy = route_energy(route_segments(self.dem, path, wind_vector))
+        if self.any_angle:
+            path, cost = simplify_path(self.dem, path, wind_vector)
+        return route_record(path, self.stations[index], lat, lon, cost, grid=self.grid, energy=round(energy, 2),
+                            **drop)
+
+    def plan_for_drone(self, lat, lon, drone, pack=None):
+        # Fastest route from the drone's station that its remaining battery can fly; pack is the full pack in Wh
+        goal, drop = self.drop_cell(self.goal_cell(lat, lon))
+        index = next((i for i, s in enumerate(self.stations) if s["id"] == drone.get("station")), None)
+        if index is None:
+            raise ValueError(f"{drone.get('id')} is at unknown station {drone.get('station')!r}")
+        wind_vector = self.wind(lat, lon)
+        stats = {}
+        path, time, energy = astar_battery(self.dem, self.cells[index], goal, battery_budget(drone, pack), wind_vector,
+                                           costs=self.costs(wind_vector), energies=self.energies(),
+                                           stats=stats)
+        if path is None and stats.get("truncated"):
+            raise ValueError(f"No route for {drone['id']} to ({lat}, {lon}) found within the search time limit")
+        if path is None:
+            raise ValueError(f"{drone['id']} cannot reach ({lat}, {lon}) on {drone.get('battery', 0)}% battery")
+        return route_record(path, self.stations[index], lat, lon, time, drone_id=drone["id"], grid=self.grid,
+                            energy=round(energy, 2), **drop)
+
+    def handle(self, request):
+        # JSON request body: {"lat": ..., "lon": ...}
+        try:
+            lat, lon = float(request["lat"]), float(request["lon"])
+        except (KeyError, TypeError, ValueError):
+            raise ValueError("Request needs numeric 'lat' and 'lon'")
+        return self.plan(lat, lon)
+
+    def submit(self, request):
+        return self.pool.submit(self.handle, request)
+
+    def submit_many(self, requests_):
+        # A batch of alerts: coordinates are parsed and placed on the DEM in one call, then planned in the pool
+        try:
+            lats = [float(r["lat"]) for r in requests_]
+            lons = [float(r["lon"]) for r in requests_]
+        except (KeyError, TypeError, ValueError):
+            raise ValueError("Every request needs numeric 'lat' and 'lon'")
+        rows, cols = self.goal_cells(lats, lons)
+        return [self.pool.submit(self.plan, lat, lon, (int(r), int(c))) for lat, lon, r, c in zip(lats, lons, rows, cols)]
+
+    def close(self):
+        self.pool.shutdown(wait=True)
+        self.builder.shutdown(wait=True)
+        self.dem_manager.close()
@@ -0,0 +1,132 @@
+import json
+import os
+import threading
+import time
+from datetime import datetime
+import numpy as np
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "DroneFlightInterface", "src", "data")
+FULL_SHAPE = (779, 2494)  # output_4.tiff, the raster the dashboard's stations.json refers to
+PERCENTILES = (50, 90, 95, 99)
+# Metrics compared between runs, with the absolute change below which a rise is noise; None marks a metric where
+# lower is worse
+TRACKED = {"latency_ms.p50": 1.0, "latency_ms.p95": 2.0, "latency_ms.p99": 5.0, "expanded.mean": 100,
+           "peak_rss_mb": 8, "startup_s": 0.1, "route_cache.hit_rate": None}
+
+
+def load_json(name, data_dir=DATA_DIR):
+    with open(os.path.join(data_dir, name)) as f:
+        return json.load(f)
+
+
+def scaled_stations(stations, grid, shape=FULL_SHAPE):
+    # stations.json placed on a DEM of another size: cells on the full raster scaled to grid.shape, then back to
+    # lat/lon with the grid so Planner places them on the same cells
+    rows, cols = grid.legacy(shape).to_cells([s["lat"] for s in stations], [s["lon"] for s in stations])
+    rows = np.minimum((rows * grid.shape[0] / shape[0]).astype(int), grid.shape[0] - 1)
+    cols = np.minimum((cols * grid.shape[1] / shape[1]).astype(int), grid.shape[1] - 1)
+    lat, lon = grid.to_latlon(rows, cols, center=True)
+    return [dict(s, lat=float(a), lon=float(b)) for s, a, b in zip(stations, lat, lon)]
+
+
+def incident_stream(grid, centers, n, rate=1 / 60, spread=40, repeat=0.2, seed=0):
+    # n incidents in mission time: Poisson arrivals at `rate` per second, scattered `spread` cells around the
+    # given (lat, lon) centers (stations, drone positions). A `repeat` share lands next to an earlier incident,
+    # the way one accident brings several alerts.
+    rng = np.random.default_rng(seed)
+    times = np.cumsum(rng.exponential(1 / rate, n))
+    rows, cols = grid.to_cells(*np.array(centers, dtype=float).T)
+    pick = rng.integers(0, len(rows), n)
+    r = rows[pick] + rng.normal(0, spread, n)
+    c = cols[pick] + rng.normal(0, spread, n)
+    for i in np.nonzero(rng.random(n) < repeat)[0]:
+        if i:
+            j = rng.integers(0, i)
+            r[i], c[i] = r[j] + rng.normal(0, 1), c[j] + rng.normal(0, 1)
+    r = np.clip(r, 0, grid.shape[0] - 1)
+    c = np.clip(c, 0, grid.shape[1] - 1)
+    lat, lon = grid.to_latlon(r, c)
+    return [{"time": float(t), "lat": float(a), "lon": float(b)} for t, a, b in zip(times, lat, lon)]
+
+
+def load_replay(path, grid):
+    # Incidents from a replayEvents.json-style file ({"events": [{"timestamp", "coordinates": [lon, lat]}]}),
+    # timed from the first event. Returns (incidents, number of events outside the DEM, which are skipped).
+    with open(path) as f:
+        events = json.load(f)["events"]
+    if not events:
+        return [], 0
+    stamps = [datetime.fromisoformat(e["timestamp"].replace("Z", "+00:00")).timestamp() for e in events]
+    lon, lat = np.array([e["coordinates"] for e in events], dtype=float).T
+    inside = grid.contains(lat, lon)
+    incidents = [{"time": t - stamps[0], "lat": float(a), "lon": float(b)}
+                 for t, a, b, ok in zip(stamps, lat, lon, inside) if ok]
+    return incidents, int((~inside).sum())
+
+
+def replay(stream, submit, speedup=0):
+    # Submits each incident when its mission time comes up, `speedup` times faster than real time (0: all at
+    # once). submit(incident) returns a future. Returns per-incident (latency s, result or None, error or None),
+    # latency measured from the moment the incident was due.
+    results = [None] * len(stream)
+    done = threading.Semaphore(0)
+    start = time.perf_counter()
+
+    def finished(i, due):
+        def callback(future):
+            latency = time.perf_counter() - due
+            error = future.exception()
+            results[i] = (latency, None if error else future.result(), error)
+            done.release()
+        return callback
+
+    for i, incident in enumerate(stream):
+        due = start + (incident["time"] - stream[0]["time"]) / speedup if speedup else start
+        wait = due - time.perf_counter()
+        if wait > 0:
+            time.sleep(wait)
+        submit(incident).add_done_callback(finished(i, max(due, start)))
+    for _ in stream:
+        done.acquire()
+    return results
+
+
+def summarize(values, percentiles=PERCENTILES):
+    values = np.asarray(values, dtype=float)
+    if len(values) == 0:
+        return {}
+    summary = {f"p{p}": float(np.percentile(values, p)) for p in percentiles}
+    summary.update(mean=float(values.mean()), max=float(values.max()))
+    return summary
+
+
+def metric(case, name):
+    value = case
+    for part in name.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return None
+        value = value[part]
+    return value
+
+
+def compare(baseline, current, tolerance=0.2):
+    # Regressions of `current` against `baseline` results, as readable lines. A tracked metric regresses when it
+    # rises by more than `tolerance` (relative) and by more than its noise floor; a hit rate when it drops by more
+    # than `tolerance` / 4 (absolute).
+    previous = {case["name"]: case for case in baseline["cases"]}
+    regressions = []
+    for case in current["cases"]:
+        base = previous.get(case["name"])
+        if base is None:
+            continue
+        for name, floor in TRACKED.items():
+            old, new = metric(base, name), metric(case, name)
+            if old is None or new is None:
+                continue
+            if floor is None:
+                worse = old - new > tolerance / 4
+            else:
+                worse = new > old * (1 + tolerance) and new - old > floor
+            if worse:
+                regressions.append(f"{case['name']}: {name} {old:.3g} -> {new:.3g}")
+    return regressions
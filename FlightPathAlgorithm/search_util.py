@@ -0,0 +1,348 @@
+import heapq
+from time import perf_counter
+import numpy as np
+from path_util import (altitude_velocity, velocity, lpixel, travel_time, NEIGHBOURS, heuristic_vertices,
+                       time_lower_bound)
+from cost_util import edge_costs
+from energy_util import edge_energies, energy_lower_bound
+
+
+def step_constants(wind_vector):
+    # Per-direction (offset, step distance, max altitude change, travel time), independent of the search state
+    steps = []
+    for dr, dc in NEIGHBOURS:
+        step_distance = np.linalg.norm([dr, dc])
+        max_alt_change = altitude_velocity * (step_distance / (velocity / lpixel))
+        tt = travel_time(step_distance, np.array([dr, dc]), wind_vector)
+        steps.append((dr, dc, max_alt_change, tt))
+    return steps
+
+
+def astar_array(dem, start, goal, wind_vector=np.array([0, 0]), stats=None, costs=None, deadline=None):
+    # Drop-in for path_util.astar on flat cell indices: float64 g-scores, int32 predecessors, uint8 closed bitmap.
+    # Returns (came_from, cost_so_far) as flat arrays; -1 / inf mark cells that were never reached. Past a
+    # perf_counter() deadline the search stops where it is (stats["truncated"]), the goal's cost then unreliable.
+    # With precomputed cost_util.edge_costs rasters each relaxation is a single lookup, and the heuristic is
+    # built from each direction's cheapest edge, which stays admissible for any wind or pixel size behind them.
+    h, w = dem.shape
+    flat_dem = dem.ravel()
+    steps = step_constants(wind_vector)
+    if costs is not None:
+        costs = costs.reshape(len(NEIGHBOURS), h * w)
+        vertices = heuristic_vertices(costs.min(axis=1))
+    else:
+        vertices = heuristic_vertices([tt for _, _, _, tt in steps])
+    cost_so_far = np.full(h * w, np.inf)
+    came_from = np.full(h * w, -1, dtype=np.int32)
+    closed = np.zeros(h * w, dtype=np.uint8)
+
+    gr, gc = goal
+    s = start[0] * w + start[1]
+    g_idx = goal[0] * w + goal[1]
+    cost_so_far[s] = 0
+    frontier = [(0, s)]
+    expanded = pushed = reopened = 0
+    truncated = False
+    while frontier:
+        _, current = heapq.heappop(frontier)
+        if closed[current]:
+            continue
+        if current == g_idx:
+            break
+        closed[current] = 1
+        expanded += 1
+        if deadline is not None and not expanded % 4096 and perf_counter() > deadline:
+            truncated = True
+            break
+        r, c = divmod(current, w)
+        g = cost_so_far[current]
+        z = flat_dem[current]
+        for k, (dr, dc, max_alt_change, tt) in enumerate(steps):
+            nr = r + dr
+            nc = c + dc
+            nxt = current + dr * w + dc
+            if costs is not None:
+                time = costs[k][current]
+                if time == np.inf:
+                    continue
+            else:
+                if nr < 0 or nc < 0 or nr >= h or nc >= w:
+                    continue
+                time = 0
+                alt_diff = flat_dem[nxt] - z
+                if alt_diff > max_alt_change:
+                    time = alt_diff / altitude_velocity
+                time += tt
+            new_cost = g + time
+            if new_cost < cost_so_far[nxt]:
+                cost_so_far[nxt] = new_cost
+                came_from[nxt] = current
+                if closed[nxt]:
+                    closed[nxt] = 0
+                    reopened += 1
+                heapq.heappush(frontier, (new_cost + time_lower_bound(vertices, gr - nr, gc - nc), nxt))
+                pushed += 1
+    if stats is not None:
+        stats.update(expanded=expanded, pushed=pushed, reopened=reopened, truncated=truncated)
+    return came_from, cost_so_far
+
+
+def reconstruct_path_array(came_from, start, goal, shape):
+    w = shape[1]
+    s = start[0] * w + start[1]
+    current = goal[0] * w + goal[1]
+    path = [current]
+    while current != s:
+        current = int(came_from[current])
+        path.append(current)
+    path.reverse()
+    return [divmod(int(p), w) for p in path]
+
+
+def astar_bidirectional(dem, start, goal, wind_vector=np.array([0, 0]), costs=None, stats=None):
+    # Forward search from the station and backward search from the beacon over the same cost rasters. Edges are
+    # asymmetric (climb penalty, wind), so the backward pass relaxes u -> v with the cost of u -> v, not v -> u.
+    # Both sides share the average potential p(v) = (h_goal(v) - h_start(v)) / 2 built from the time heuristic:
+    # forward keys are g + p, backward keys g - p, so both see non-negative reduced costs and the search can stop
+    # as soon as the two smallest keys add up to the best meeting cost, which makes the join optimal. (Keys are
+    # not shifted by p(s) and -p(t), so the potential offset of the textbook test is already in them.)
+    # Returns (path, cost) like reconstruct_path plus cost_so_far[goal].
+    h, w = dem.shape
+    if costs is None:
+        costs = edge_costs(dem, wind_vector)
+    costs = costs.reshape(len(NEIGHBOURS), h * w)
+    vertices = heuristic_vertices(costs.min(axis=1))
+    offsets = [dr * w + dc for dr, dc in NEIGHBOURS]
+    s = start[0] * w + start[1]
+    t = goal[0] * w + goal[1]
+    g = [np.full(h * w, np.inf), np.full(h * w, np.inf)]
+    link = [np.full(h * w, -1, dtype=np.int32), np.full(h * w, -1, dtype=np.int32)]
+    closed = [np.zeros(h * w, dtype=np.uint8), np.zeros(h * w, dtype=np.uint8)]
+    g[0][s] = 0
+    g[1][t] = 0
+    potential = (time_lower_bound(vertices, goal[0] - start[0], goal[1] - start[1])) / 2
+    frontiers = [[(potential, s)], [(potential, t)]]
+    best, meet = (0.0, s) if s == t else (np.inf, -1)
+    expanded = [0, 0]
+    pushed = reopened = 0
+    while True:
+        # Stale entries of settled cells would hold the top keys low and keep the stopping test from firing
+        for side in (0, 1):
+            while frontiers[side] and closed[side][frontiers[side][0][1]]:
+                heapq.heappop(frontiers[side])
+        if not (frontiers[0] and frontiers[1]) or frontiers[0][0][0] + frontiers[1][0][0] >= best:
+            break
+        # Alternate by settled cells, so each side covers half the area; the smaller heap is not the smaller search
+        side = 0 if expanded[0] <= expanded[1] else 1
+        _, current = heapq.heappop(frontiers[side])
+        closed[side][current] = 1
+        expanded[side] += 1
+        r, c = divmod(current, w)
+        gs, other = g[side], g[1 - side]
+        for k, (dr, dc) in enumerate(NEIGHBOURS):
+            if side == 0:
+                nr, nc = r + dr, c + dc
+                if nr < 0 or nc < 0 or nr >= h or nc >= w:
+                    continue
+                nxt = current + offsets[k]
+                time = costs[k][current]
+            else:
+                nr, nc = r - dr, c - dc
+                if nr < 0 or nc < 0 or nr >= h or nc >= w:
+                    continue
+                nxt = current - offsets[k]
+                time = costs[k][nxt]
+            if time == np.inf:
+                continue
+            new_cost = gs[current] + time
+            if new_cost < gs[nxt]:
+                gs[nxt] = new_cost
+                link[side][nxt] = current
+                if closed[side][nxt]:
+                    closed[side][nxt] = 0
+                    reopened += 1
+                potential = (time_lower_bound(vertices, goal[0] - nr, goal[1] - nc)
+                             - time_lower_bound(vertices, nr - start[0], nc - start[1])) / 2
+                priority = new_cost + potential if side == 0 else new_cost - potential
+                heapq.heappush(frontiers[side], (priority, nxt))
+                pushed += 1
+                if new_cost + other[nxt] < best:
+                    best, meet = new_cost + other[nxt], nxt
+    if stats is not None:
+        stats.update(expanded=expanded[0] + expanded[1], expanded_forward=expanded[0],
+                     expanded_backward=expanded[1], pushed=pushed, reopened=reopened)
+    if meet < 0:
+        return None, np.inf
+    path = [meet]
+    while path[-1] != s:
+        path.append(int(link[0][path[-1]]))
+    path.reverse()
+    while path[-1] != t:
+        path.append(int(link[1][path[-1]]))
+    return [divmod(int(p), w) for p in path], float(best)
+
+
+def _route_totals(costs, energies, path, w):
+    # Time and energy of a path over flattened cost and energy rasters
+    index = {move: k for k, move in enumerate(NEIGHBOURS)}
+    moves = [index[(b[0] - a[0], b[1] - a[1])] for a, b in zip(path, path[1:])]
+    cells = [a[0] * w + a[1] for a in path[:-1]]
+    return float(costs[moves, cells].sum()), float(energies[moves, cells].sum())
+
+
+def _battery_labels(costs, energies, vertices, w, start, goal, budget, mass, eps, max_labels, deadline,
+                    incumbent=np.inf):
+    # The label-setting search of astar_battery on flattened costs/energies, with energies within eps of a settled
+    # label counted as dominated and labels that cannot beat the incumbent route's time dropped. Returns the
+    # fastest goal label reached, (path, time, energy) or None, and stats; when the search stops early
+    # (stats["truncated"]) that is the best goal label pushed so far.
+    offsets = [dr * w + dc for dr, dc in NEIGHBOURS]
+    gr, gc = goal
+    s = start[0] * w + start[1]
+    g_idx = gr * w + gc
+    settled_energy = np.full(costs.shape[1], np.inf)
+    # Label store: cell, parent label, time, energy
+    cells, parents, times, used = [s], [-1], [0.0], [0.0]
+    frontier = [(time_lower_bound(vertices, gr - start[0], gc - start[1]), 0)]
+    expanded = pruned = 0
+    best = -1
+    truncated = False
+    while frontier:
+        priority, label = heapq.heappop(frontier)
+        if priority >= incumbent:
+            break  # nothing left can be faster than the incumbent
+        current, energy = cells[label], used[label]
+        if energy >= settled_energy[current] - eps:
+            continue
+        settled_energy[current] = energy
+        if current == g_idx:
+            best = label
+            break
+        expanded += 1
+        r, c = divmod(current, w)
+        for k, (dr, dc) in enumerate(NEIGHBOURS):
+            time = costs[k][current]
+            if time == np.inf:
+                continue
+            nxt = current + offsets[k]
+            new_energy = energy + energies[k][current]
+            if new_energy >= settled_energy[nxt] - eps:
+                continue
+            nr, nc = r + dr, c + dc
+            new_time = times[label] + time
+            bound = new_time + time_lower_bound(vertices, gr - nr, gc - nc)
+            if bound >= incumbent or new_energy + energy_lower_bound(gr - nr, gc - nc, mass) > budget:
+                pruned += 1
+                continue
+            cells.append(nxt)
+            parents.append(label)
+            times.append(new_time)
+            used.append(new_energy)
+            heapq.heappush(frontier, (bound, len(cells) - 1))
+            if nxt == g_idx:
+                # A complete route that fits: it becomes the incumbent
+                best, incumbent = len(cells) - 1, new_time
+        if len(cells) > max_labels or (deadline is not None and not expanded % 1024 and perf_counter() > deadline):
+            truncated = True
+            break
+    stats = {"expanded": expanded, "labels": len(cells), "pruned": pruned, "truncated": truncated}
+    if best < 0:
+        return None, stats
+    path = [best]
+    while parents[path[-1]] >= 0:
+        path.append(parents[path[-1]])
+    path.reverse()
+    return ([divmod(cells[label], w) for label in path], times[best], used[best]), stats
+
+
+def astar_battery(dem, start, goal, budget, wind_vector=np.array([0, 0]), costs=None, energies=None, mass=24.0,
+                  resolution=0.02, max_labels=2_000_000, time_limit=2.0, lagrange_steps=6, stats=None):
+    # Fastest route whose energy stays within `budget` Wh, in stages that each only run when the one before did
+    # not settle it:
+    # 1. the straight-line energy bound: beyond the budget there is no route at all;
+    # 2. the unconstrained fastest route, returned as is when it fits;
+    # 3. the least-energy route: when even that does not fit there is no route, otherwise it is the incumbent;
+    # 4. a few Lagrangian steps (LARAC), each a search on time + lambda * energy with lambda set from the best
+    #    feasible and infeasible routes so far, which usually bring the incumbent close to the optimum;
+    # 5. a label-setting search with energy as a second resource. Labels carry (time, energy) and are popped in
+    #    time + heuristic order, so a label is dominated exactly when an earlier label at the same cell already
+    #    used no more energy, and one number per cell (least energy settled so far) replaces a Pareto set. Labels
+    #    that cannot reach the goal on the remaining battery, flying level in a straight line, or cannot beat the
+    #    incumbent's time are dropped. The first goal label popped is the fastest feasible route.
+    # To bound the labels per cell, an energy up to eps = resolution * budget / d Wh below a settled label's still
+    # counts as dominated, d being the start-goal distance in cells. Each cell on a route can cost eps this way, so
+    # the route returned always fits the budget and is no slower than the fastest route fitting
+    # budget * (1 - resolution * L / d), L its length in cells (L / d is typically 1-1.5): either the label search
+    # finds such a route or the incumbent already beats it. resolution=0 is exact.
+    # Every stage counts against time_limit seconds (and the label search against max_labels); when it runs out
+    # the best feasible route found so far is returned, or none if stage 3 was not reached (stats["truncated"]
+    # tells), so a live dispatch gets an answer in bounded time.
+    # Returns (path, time, energy), or (None, inf, inf) when no route fits the budget.
+    deadline = None if time_limit is None else perf_counter() + time_limit
+    h, w = dem.shape
+    totals = {"expanded": 0, "labels": 0, "pruned": 0}
+
+    def finish(result, truncated=False, unconstrained=False):
+        if stats is not None:
+            stats.update(totals, truncated=truncated, unconstrained=unconstrained)
+        return result if result is not None else (None, np.inf, np.inf)
+
+    if energy_lower_bound(goal[0] - start[0], goal[1] - start[1], mass) > budget:
+        return finish(None)
+    if costs is None:
+        costs = edge_costs(dem, wind_vector)
+    if energies is None:
+        energies = edge_energies(dem, mass)
+    costs = costs.reshape(len(NEIGHBOURS), h * w)
+    energies = energies.reshape(len(NEIGHBOURS), h * w)
+
+    def search(weights):
+        # (path, time, energy) of the cheapest route under `weights`, None if unreachable, False past the deadline
+        run = {}
+        came_from, cost_so_far = astar_array(dem, start, goal, costs=weights, stats=run, deadline=deadline)
+        totals["expanded"] += run["expanded"]
+        if run["truncated"]:
+            return False
+        if cost_so_far[goal[0] * w + goal[1]] == np.inf:
+            return None
+        path = reconstruct_path_array(came_from, start, goal, dem.shape)
+        return (path, *_route_totals(costs, energies, path, w))
+
+    fastest = search(costs)
+    if fastest is False:
+        return finish(None, truncated=True)
+    if fastest is None:
+        return finish(None)
+    if fastest[2] <= budget:
+        return finish(fastest, unconstrained=True)
+    frugal = search(energies)
+    if frugal is False:
+        return finish(None, truncated=True)
+    if frugal[2] > budget:
+        return finish(None)
+    incumbent, infeasible = frugal, fastest
+    for _ in range(lagrange_steps):
+        lam = (incumbent[1] - infeasible[1]) / (infeasible[2] - incumbent[2])
+        if not 0 < lam < np.inf or (deadline is not None and perf_counter() > deadline):
+            break
+        route = search(costs + lam * energies)
+        if not route:
+            break
+        # No route with a lower time + lambda * energy than the two it was set from: LARAC has converged
+        if route[1] + lam * route[2] >= incumbent[1] + lam * incumbent[2] - 1e-9 * incumbent[1]:
+            break
+        if route[2] <= budget:
+            incumbent = route
+        else:
+            infeasible = route
+    if deadline is not None and perf_counter() > deadline:
+        return finish(incumbent, truncated=True)
+    vertices = heuristic_vertices(costs.min(axis=1))
+    steps = max(abs(goal[0] - start[0]), abs(goal[1] - start[1]), 1)
+    result, run = _battery_labels(costs, energies, vertices, w, start, goal, budget, mass,
+                                  resolution * budget / steps, max_labels, deadline, incumbent[1])
+    for name in totals:
+        totals[name] += run[name]
+    if result is not None and result[1] < incumbent[1]:
+        incumbent = result
+    return finish(incumbent, truncated=run["truncated"])
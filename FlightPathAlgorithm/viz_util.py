@@ -0,0 +1,51 @@
+# Optional plotting layer, matplotlib is only imported when something is drawn
+import numpy as np
+
+
+def plot_path(dem, path):
+    import matplotlib.pyplot as plt
+    plt.imshow(dem, cmap='terrain')
+    y, x = zip(*path)
+    plt.plot(x, y, 'r-', linewidth=2)
+    plt.title("Path over Elevation Map")
+    plt.xlabel("X")
+    plt.ylabel("Y")
+    plt.colorbar(label='Elevation (m)')
+    plt.show()
+
+
+def plot_elevation(elevations):
+    import matplotlib.pyplot as plt
+    plt.figure()
+    plt.plot(range(len(elevations)), elevations, label="Elevation Profile")
+    plt.title("Elevation Along the Path")
+    plt.xlabel("Step")
+    plt.ylabel("Elevation (m)")
+    plt.grid(True)
+    plt.legend()
+    plt.show()
+
+
+def plot_paths(dem, paths, best, starts, goal, offset=(0, 0)):
+    # All station routes over the DEM window, the fastest in blue; axes in full-DEM pixel coordinates
+    import matplotlib.pyplot as plt
+    row0, col0 = offset
+    plt.figure(figsize=(10, 10))
+    h, w = dem.shape
+    plt.imshow(dem, cmap='terrain', extent=(col0 - 0.5, col0 + w - 0.5, row0 + h - 0.5, row0 - 0.5))
+
+    for idx, path in enumerate(paths):
+        y, x = zip(*path)
+        color = 'blue' if idx == best else 'orange'
+        plt.plot(np.add(x, col0), np.add(y, row0), color=color, linewidth=2)
+
+    for start in starts:
+        plt.plot(start[1], start[0], 'go', markersize=8)
+    plt.plot(goal[1], goal[0], 'ro', markersize=8)
+
+    plt.title("Paths to Destination")
+    plt.xlabel("X")
+    plt.ylabel("Y")
+    plt.colorbar(label='Elevation (m)')
+    plt.grid(True)
+    plt.show()
@@ -0,0 +1,170 @@
+import json
+import logging
+import math
+import time
+import numpy as np
+from cost_util import wind_key
+from geo_util import GeoGrid
+
+logger = logging.getLogger(__name__)
+CALM = np.zeros(2)
+
+
+def wind_from_met(speed, deg):
+    # Meteorological wind (m/s, degrees the wind blows FROM, clockwise from north) to the planner's
+    # (row, col) wind_vector: rows grow southwards and cols eastwards on the DEM.
+    rad = math.radians(deg)
+    return np.array([speed * math.cos(rad), -speed * math.sin(rad)])
+
+
+class StubWeather:
+    # Constant wind, for offline runs and tests
+
+    def __init__(self, wind_vector=(0, 0)):
+        self.wind_vector = np.array(wind_vector, dtype=float)
+
+    def wind(self, lat, lon):
+        return self.wind_vector
+
+
+class OneCallWeather:
+    # Current wind from the OpenWeather One Call API
+
+    url = "https://api.openweathermap.org/data/2.5/onecall"
+
+    def __init__(self, api_key, timeout=5):
+        self.api_key = api_key
+        self.timeout = timeout
+
+    def fetch(self, lat, lon):
+        import requests
+        response = requests.get(self.url, params={"lat": lat, "lon": lon, "appid": self.api_key},
+                                timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def wind(self, lat, lon):
+        current = self.fetch(lat, lon).get("current", {})
+        return wind_from_met(current.get("wind_speed", 0.0), current.get("wind_deg", 0.0))
+
+
+class FileWeather:
+    # File-backed stand-in for the API, for offline tests and benchmarks. The file holds a list of samples
+    # {"lat", "lon", "wind_speed", "wind_deg"}; every query answers with the nearest one.
+
+    def __init__(self, path):
+        with open(path) as f:
+            self.samples = json.load(f)
+        self.points = np.array([[s["lat"], s["lon"]] for s in self.samples])
+        self.calls = 0
+
+    def fetch(self, lat, lon):
+        self.calls += 1
+        nearest = self.samples[int(np.argmin(((self.points - (lat, lon)) ** 2).sum(axis=1)))]
+        return {"lat": lat, "lon": lon, "current": {"wind_speed": nearest["wind_speed"], "wind_deg": nearest["wind_deg"]}}
+
+    def wind(self, lat, lon):
+        current = self.fetch(lat, lon)["current"]
+        return wind_from_met(current["wind_speed"], current["wind_deg"])
+
+
+class WeatherCache:
+    # Wraps a provider: answers are kept for `ttl` seconds per spatial bucket of `bucket_deg` degrees, so a burst
+    # of alerts in the same area costs at most one request. When the provider fails, the last answer for the bucket (or
+    # any bucket, or calm wind) stands in so routing carries on.
+
+    def __init__(self, provider, ttl=600, bucket_deg=0.1):
+        self.provider = provider
+        self.ttl = ttl
+        self.bucket_deg = bucket_deg
+        self._entries = {}
+        self._last = None
+        self.hits = self.fetches = self.errors = 0
+
+    def wind(self, lat, lon):
+        key = (round(lat / self.bucket_deg), round(lon / self.bucket_deg))
+        entry = self._entries.get(key)
+        now = time.monotonic()
+        if entry and now - entry[0] < self.ttl:
+            self.hits += 1
+            return entry[1]
+        self.fetches += 1
+        try:
+            wind = self.provider.wind(key[0] * self.bucket_deg, key[1] * self.bucket_deg)
+        except Exception as e:
+            self.errors += 1
+            fallback = entry[1] if entry else self._last if self._last is not None else CALM
+            logger.warning("Weather request for (%.3f, %.3f) failed, using %s wind: %s", lat, lon,
+                           "cached" if entry or self._last is not None else "calm", e)
+            return fallback
+        self._entries[key] = (now, wind)
+        self._last = wind
+        return wind
+
+
+def wind_raster(shape, lattice):
+    # Bilinear upsampling of an (ny, nx, 2) lattice of wind vectors, spread evenly over the DEM corners,
+    # to an (h, w, 2) per-cell raster
+    h, w = shape
+    ny, nx, _ = lattice.shape
+    fy = np.linspace(0, ny - 1, h) if ny > 1 else np.zeros(h)
+    fx = np.linspace(0, nx - 1, w) if nx > 1 else np.zeros(w)
+    y0 = np.minimum(fy.astype(int), max(ny - 2, 0))
+    x0 = np.minimum(fx.astype(int), max(nx - 2, 0))
+    y1, x1 = np.minimum(y0 + 1, ny - 1), np.minimum(x0 + 1, nx - 1)
+    ty, tx = (fy - y0)[:, None, None], (fx - x0)[None, :, None]
+    top = lattice[y0][:, x0] * (1 - tx) + lattice[y0][:, x1] * tx
+    bottom = lattice[y1][:, x0] * (1 - tx) + lattice[y1][:, x1] * tx
+    return top * (1 - ty) + bottom * ty
+
+
+class WindField:
+    # Per-cell wind raster aligned to the DEM, sampled from a provider on an ny x nx lattice and rebuilt at most
+    # once per `ttl` seconds. The raster's wind key is computed once per build, hashing it costs ~80 ms at full size.
+
+    def __init__(self, provider, shape, lattice=(3, 3), ttl=600, grid=None):
+        self.provider = provider
+        self.shape = shape
+        self.grid = grid or GeoGrid.legacy(shape)
+        self.lattice = lattice
+        self.ttl = ttl
+        self._current = None  # (raster, wind key)
+        self._built = 0.0
+
+    def sample_lattice(self):
+        ny, nx = self.lattice
+        rows, cols = np.meshgrid(np.linspace(0, self.shape[0] - 1, ny), np.linspace(0, self.shape[1] - 1, nx),
+                                 indexing="ij")
+        lats, lons = self.grid.to_latlon(rows, cols)
+        return np.array([self.provider.wind(lat, lon) for lat, lon in zip(lats.ravel(), lons.ravel())],
+                        dtype=float).reshape(ny, nx, 2)
+
+    def build(self):
+        # A new (raster, wind key); if the provider fails the current raster (or calm wind) is kept
+        try:
+            raster = wind_raster(self.shape, self.sample_lattice())
+        except Exception as e:
+            logger.warning("Wind lattice sampling failed, keeping the previous wind: %s", e)
+            if self._current is not None:
+                return self._current
+            raster = np.zeros(tuple(self.shape) + (2,))
+        return raster, wind_key(raster)
+
+    def publish(self, raster, key):
+        self._current = (raster, key)
+        self._built = time.monotonic()
+
+    def stale(self):
+        # True once the published raster is older than the ttl
+        return self._current is not None and time.monotonic() - self._built >= self.ttl
+
+    def current(self):
+        # The published (raster, wind key) as is, stale or not; only the very first one is built in place
+        if self._current is None:
+            self.publish(*self.build())
+        return self._current
+
+    def raster(self):
+        if self._current is None or self.stale():
+            self.publish(*self.build())
+        return self._current[0]